@@ -4,12 +4,20 @@ import pandas as pd
 import numpy as np
 import folium
 import branca.colormap as cm
+from branca.element import MacroElement, Template
 from streamlit_folium import st_folium
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from folium.plugins import HeatMap
 import datetime
+import json
+import threading
+import heapq
+from collections import Counter, OrderedDict
+from sklearn.neighbors import BallTree
+from vlucht_inlezen import (bron_signatuur, lees_of_bouw_parquet, zoek_vluchtbestanden, ingest_vluchten, lees_nieuwe_regels,
+                            VLUCHT_SCHEMA, compacteer, geheugen_mb, lees_luchthaven_bestand)
 
 st.set_page_config(page_title='Eindpresentatie visualisatie ', page_icon='✈️')
 
@@ -22,43 +30,1217 @@ with st.sidebar:
         menu_icon="list"
     )
 #---------------------------------------------------------------------------
-# Functie voor laden van vluchten data
-@st.cache_data
-def load_vluchten_data():
-    vluchten_data = {
-        f'vlucht {i}': pd.read_excel(f'cleaned_30Flight {i}.xlsx') 
-        for i in range(1, 8)
+# Map en bestandspatroon van de vluchtbestanden; elk bestand dat hieraan voldoet wordt een vlucht
+VLUCHT_MAP = '.'
+VLUCHT_PATROON = 'cleaned_*.xlsx'
+
+# Vaste kleuren voor de eerste vluchten, daarna wordt een groter palet herhaald
+VLUCHT_KLEUREN = ['red', 'green', 'blue', 'orange', 'purple', 'brown', 'pink'] + px.colors.qualitative.Alphabet
+
+# Functie die de vluchtbestanden zoekt, met per bestand een sleutel ('vlucht N')
+def vlucht_bestanden():
+    return zoek_vluchtbestanden(VLUCHT_MAP, VLUCHT_PATROON)
+
+# Functie voor de signatuur van alle vluchtbestanden
+def vluchten_signatuur():
+    return bron_signatuur(vlucht_bestanden().values())
+
+# Functie om elke vlucht een vaste kleur te geven
+def maak_kleuren_map(namen):
+    return {naam: VLUCHT_KLEUREN[i % len(VLUCHT_KLEUREN)] for i, naam in enumerate(namen)}
+
+# Functie voor laden van alle vluchten in één lang frame (de signatuur zorgt dat een gewijzigd bestand
+# opnieuw wordt geladen). De kolom 'vlucht' is categorisch en 'Time (hours)' wordt hier één keer berekend.
+# Bestanden die niet gelezen konden worden staan met hun foutmelding in df_all.attrs['fouten'].
+# De kolommen worden omgezet naar compacte datatypes (VLUCHT_SCHEMA); het geheugengebruik (MB) voor en
+# na het omzetten staat in df_all.attrs['geheugen'].
+# Het frame wordt gedeeld tussen alle sessies (cache_resource) en mag dus niet worden aangepast.
+# Alleen het frame van de laatste signatuur wordt bewaard; na een wijziging van de bestanden valt het oude weg.
+@st.cache_resource(max_entries=1)
+def load_alle_vluchten(signatuur):
+    frames, fouten = ingest_vluchten(vlucht_bestanden())
+    namen = list(frames)
+    lengtes = [len(df) for df in frames.values()]
+    geheugen_voor = sum(geheugen_mb(df) for df in frames.values())
+    frames = {naam: compacteer(df, VLUCHT_SCHEMA) for naam, df in frames.items()}
+
+    if frames:
+        df_all = pd.concat(frames.values(), ignore_index=True)
+    else:
+        df_all = pd.DataFrame(columns=['Time (secs)', '[3d Latitude]', '[3d Longitude]', '[3d Altitude Ft]',
+                                       'TRUE AIRSPEED (derived)'], dtype='float32')
+    df_all['vlucht'] = pd.Categorical.from_codes(np.repeat(np.arange(len(namen)), lengtes), categories=namen)
+    df_all['Time (hours)'] = (df_all['Time (secs)'] / 3600).astype('float32')
+    df_all.attrs['fouten'] = fouten
+    df_all.attrs['geheugen'] = {'voor': geheugen_voor, 'na': geheugen_mb(df_all)}
+    return df_all
+
+# Functie om per vlucht de begin- en eindrij in het lange frame te vinden.
+# De vluchten staan achter elkaar, dus de categorie-codes zijn gesorteerd.
+def vlucht_grenzen(df_all):
+    codes = df_all['vlucht'].cat.codes.to_numpy()
+    categorie = np.arange(len(df_all['vlucht'].cat.categories))
+    starts = np.searchsorted(codes, categorie, side='left')
+    stops = np.searchsorted(codes, categorie, side='right')
+    return {vlucht: (start, stop) for vlucht, start, stop in zip(df_all['vlucht'].cat.categories, starts, stops)}
+
+# Functie voor laden van vluchten data: per vlucht een slice van het lange frame, zonder kopie
+def load_vluchten_data(signatuur):
+    df_all = load_alle_vluchten(signatuur)
+    return {vlucht: df_all.iloc[start:stop] for vlucht, (start, stop) in vlucht_grenzen(df_all).items()}
+
+# Vluchtfasen (de positie in de lijst is de fasecode) met hun kleur op de kaart
+VLUCHTFASEN = ['grond', 'klim', 'kruis', 'daling']
+FASE_KLEUREN = ['gray', 'green', 'blue', 'orange']
+
+# Instellingen voor het kleuren van de route op hoogte, snelheid of vluchtfase
+KAART_MATEN = {
+    'hoogte': {
+        'kolom': '[3d Altitude Ft]',
+        'kleuren': ['yellow', 'green', 'turquoise', 'blue', 'purple'],
+        'index': [0, 10000, 20000, 30000, 40000],
+        'caption': 'Hoogte in ft',
+        'label': 'Altitude',
+        'eenheid': 'ft'
+    },
+    'snelheid': {
+        'kolom': 'TRUE AIRSPEED (derived)',
+        'kleuren': ['yellow', 'green', 'blue', 'purple'],
+        'index': [0, 200, 400, 600],
+        'caption': 'Snelheid in knots',
+        'label': 'Speed',
+        'eenheid': 'knots'
+    },
+    'fase': {
+        'kolom': 'Fase',
+        'kleuren': FASE_KLEUREN,
+        'klassen': VLUCHTFASEN,
+        'caption': 'Vluchtfase (' + ', '.join(VLUCHTFASEN) + ')',
+        'label': 'Phase'
     }
-    return vluchten_data
-
-# Functie voor het tekenen van de kaart
-def draw_flight_map(df):
-    mid_lat, mid_lon = df['[3d Latitude]'].mean(), df['[3d Longitude]'].mean()
-    m = folium.Map(location=[mid_lat, mid_lon], zoom_start=5, tiles='CartoDB positron')
-    colormap = cm.LinearColormap(
-        colors=['yellow', 'green', 'turquoise', 'blue', 'purple'], 
-        index=[0, 10000, 20000, 30000, 40000],
-        vmin=df['[3d Altitude Ft]'].min(), 
-        vmax=df['[3d Altitude Ft]'].max(),
-        caption='Hoogte in ft.'
-    )
-
-    coordinates = list(zip(df['[3d Latitude]'], df['[3d Longitude]'], df['[3d Altitude Ft]']))
-    for i in range(1, len(coordinates)):
-        start, end = coordinates[i-1], coordinates[i]
-        color = colormap(start[2])
-        folium.PolyLine(
-            locations=[[start[0], start[1]], [end[0], end[1]]],
-            color=color, weight=2.5, opacity=1,
-            tooltip=f"Time: {df['Time (secs)'].iloc[i]} sec, Altitude: {df['[3d Altitude Ft]'].iloc[i]} ft, Speed: {df['TRUE AIRSPEED (derived)'].iloc[i]}"
-        ).add_to(m)
+}
+
+# Aantal kleuren in de kleurentabel (LUT) van een doorlopende kleurmaat
+LUT_KLEUREN = 256
+
+# Functie om de colormap (legenda) voor een kleurmaat te maken.
+# Doorlopende maten worden getrapt in LUT_KLEUREN klassen, zodat de legenda dezelfde kleuren toont als de route.
+def maak_colormap(df, maat):
+    instelling = KAART_MATEN[maat]
+    if 'klassen' in instelling:
+        # Eén kleur per fasecode
+        aantal = len(instelling['klassen'])
+        return cm.StepColormap(colors=instelling['kleuren'], index=list(range(aantal + 1)),
+                               vmin=0, vmax=aantal, caption=instelling['caption'])
+    values = df[instelling['kolom']].dropna()  # Verwijder NaN waarden
+    return cm.LinearColormap(colors=instelling['kleuren'],
+                             index=instelling['index'],
+                             vmin=values.min(),
+                             vmax=values.max(),
+                             caption=instelling['caption']).to_step(LUT_KLEUREN)
+
+# Functie om de kleurentabel van een getrapte colormap te maken: de klassegrenzen en per klasse de kleur
+def kleurentabel(colormap):
+    grenzen = np.asarray(colormap.index, dtype='float64')
+    kleuren = np.array([colormap.rgb_hex_str(grens) for grens in grenzen[:-1]])
+    return grenzen, kleuren
+
+# Functie om voor een hele array waarden in één keer de kleurklasse (index in de kleurentabel) op te zoeken.
+# Geeft de kleuren van de tabel en per waarde de klasse.
+def kleurklassen_opzoeken(colormap, waarden):
+    grenzen, kleuren = kleurentabel(colormap)
+    klasse = np.clip(np.searchsorted(grenzen, waarden, side='right') - 1, 0, len(kleuren) - 1)
+    return kleuren, klasse
+
+# Functie om de hele route compact (per kolom) op te bouwen; de browser maakt er één GeoJSON-laag van.
+# Elk segment loopt van punt i-1 naar punt i en krijgt de kleur van het beginpunt. In plaats van een feature
+# met stijl en tooltiptekst per segment staan alleen de punten, per segment het startpunt, de kleurklasse,
+# de tijd en de waarde erin; stijl en tooltip worden in de browser gemaakt (zie ROUTE_TEMPLATE).
+def track_route(df, maat, colormap):
+    instelling = KAART_MATEN[maat]
+    lat = df['[3d Latitude]'].to_numpy()
+    lon = df['[3d Longitude]'].to_numpy()
+    waarden = df[instelling['kolom']].to_numpy()
+    tijden = df['Time (secs)'].to_numpy()
+
+    # Segmenten zonder waarde of coördinaten worden overgeslagen
+    geldig = ~(np.isnan(waarden[:-1]) | np.isnan(lat[:-1]) | np.isnan(lat[1:]))
+    idx = np.flatnonzero(geldig)
+
+    kleuren, klasse = kleurklassen_opzoeken(colormap, waarden[idx])
+
+    route = {
+        'punten': np.column_stack([lon, lat]).round(5).tolist(),
+        'start': idx.tolist(),
+        'kleuren': kleuren.tolist(),
+        'klasse': klasse.tolist(),
+        'tijd': tijden[idx + 1].tolist(),
+        'label': instelling['label']
+    }
+    if 'klassen' in instelling:
+        route['waarde'] = waarden[idx].astype(int).tolist()
+        route['klassen'] = list(instelling['klassen'])
+    else:
+        route['waarde'] = waarden[idx].round(2).tolist()
+        route['eenheid'] = instelling['eenheid']
+    return route
+
+# Maximale grootte (MB) van de gedeelde cache met routes voor de kaart
+ROUTE_CACHE_MB = 64
+
+# Gedeelde cache (voor alle sessies) met de JSON-tekst van routes, van minst naar meest recent gebruikt
+@st.cache_resource
+def route_cache():
+    return {'routes': OrderedDict(), 'grootte': 0, 'lock': threading.Lock()}
+
+# Functie om de JSON-tekst van een route uit de cache te halen, of te maken en te bewaren.
+# De sleutel is (vlucht, kleurmaat, detailniveau, signatuur). Routes met een andere signatuur zijn verouderd
+# (een vluchtbestand is gewijzigd) en worden verwijderd; daarna worden de minst recent gebruikte routes
+# verwijderd tot de cache weer onder ROUTE_CACHE_MB valt.
+def route_tekst(sleutel, df, maat, colormap):
+    cache = route_cache()
+    with cache['lock']:
+        if sleutel in cache['routes']:
+            cache['routes'].move_to_end(sleutel)
+            return cache['routes'][sleutel]
+
+    tekst = json.dumps(track_route(df, maat, colormap))
+    with cache['lock']:
+        routes = cache['routes']
+        for oud in [oud for oud in routes if oud[-1] != sleutel[-1]]:
+            cache['grootte'] -= len(routes.pop(oud))
+        if sleutel not in routes:
+            routes[sleutel] = tekst
+            cache['grootte'] += len(tekst)
+        while cache['grootte'] > ROUTE_CACHE_MB * 1e6 and len(routes) > 1:
+            cache['grootte'] -= len(routes.popitem(last=False)[1])
+    return tekst
+
+# Leaflet-code voor de routelaag: de JSON-tekst van de route (zie track_route) wordt ongewijzigd in de pagina gezet.
+# De browser maakt er de GeoJSON-segmenten van en kleurt ze en maakt de tooltips pas bij het tekenen.
+ROUTE_TEMPLATE = Template("""
+{% macro script(this, kwargs) %}
+    var {{ this.get_name() }}_route = {{ this.route }};
+    var {{ this.get_name() }} = L.geoJson({
+        type: 'FeatureCollection',
+        features: {{ this.get_name() }}_route.start.map(function(i, n) {
+            var route = {{ this.get_name() }}_route;
+            return {
+                type: 'Feature',
+                id: String(n),
+                geometry: {type: 'LineString', coordinates: [route.punten[i], route.punten[i + 1]]},
+                properties: {kleur: route.kleuren[route.klasse[n]], tijd: route.tijd[n], waarde: route.waarde[n]}
+            };
+        })
+    }, {
+        style: function(feature) { return {color: feature.properties.kleur, weight: 2.5, opacity: 1}; }
+    }).bindTooltip(function(layer) {
+        var route = {{ this.get_name() }}_route, p = layer.feature.properties;
+        var waarde = route.klassen ? route.klassen[p.waarde] : p.waarde.toFixed(2) + ' ' + route.eenheid;
+        return 'Time: ' + p.tijd + ' sec, ' + route.label + ': ' + waarde;
+    }, {sticky: true}).addTo({{ this._parent.get_name() }});
+{% endmacro %}
+""")
+
+# Functie om de volledige route als één GeoJSON-laag te maken in plaats van één PolyLine per segment.
+# Met een sleutel (zie route_tekst) wordt de route uit de gedeelde cache gehaald.
+# Er is geen folium.GeoJson met style_function: die roept bij elke weergave per segment Python-code aan en zet
+# alle features opnieuw om naar JSON. Hier wordt alleen de (gecachte) compacte tekst in de pagina gezet; die
+# wordt bij het renderen wel door de templates gescand, dus hoe kleiner de tekst, hoe sneller de kaart.
+def route_laag(df, maat, colormap, sleutel=None):
+    laag = MacroElement()
+    laag._name = 'Route'
+    laag._template = ROUTE_TEMPLATE
+    laag.route = (json.dumps(track_route(df, maat, colormap)) if sleutel is None
+                  else route_tekst(sleutel, df, maat, colormap))
+    return laag
+
+# Functie voor het midden van een vlucht op de kaart (lat, lon)
+def kaart_midden(df):
+    return [float(df['[3d Latitude]'].mean()), float(df['[3d Longitude]'].mean())]
+
+# Functie voor het tekenen van de kaart (maat 'fase' verwacht een kolom 'Fase' met fasecodes).
+# Geeft de basiskaart (markers en legenda) en de route als aparte FeatureGroup. De route gaat via
+# st_folium(feature_group_to_add=...) naar de kaart, zodat de basiskaart (en daarmee de sleutel van het component)
+# gelijk blijft als alleen het detailniveau verandert; de kaart houdt dan zijn zoom en positie.
+# df is de hele vlucht (voor de legenda en de markers), idx de rijen van het detailniveau voor de route.
+# locatie en zoom zijn de beginstand van de basiskaart.
+# cache_sleutel is (vlucht, detailniveau, signatuur); de kleurmaat wordt daar voor de routecache aan toegevoegd.
+def draw_flight_map(df, show_speed=False, maat=None, cache_sleutel=None, idx=None, locatie=None, zoom=5):
+    maat = maat or ('snelheid' if show_speed else 'hoogte')
+    m = folium.Map(location=locatie or kaart_midden(df), zoom_start=zoom, tiles='CartoDB positron')
+    colormap = maak_colormap(df, maat)
+    sleutel = None if cache_sleutel is None else (cache_sleutel[0], maat) + tuple(cache_sleutel[1:])
+    laag = folium.FeatureGroup(name='Route')
+    route_laag(df if idx is None else df.iloc[idx], maat, colormap, sleutel).add_to(laag)
 
     folium.Marker(location=[df['[3d Latitude]'].iloc[0], df['[3d Longitude]'].iloc[0]],
                   popup="AMSTERDAM (AMS)", tooltip="AMSTERDAM (AMS)").add_to(m)
     folium.Marker(location=[df['[3d Latitude]'].iloc[-1], df['[3d Longitude]'].iloc[-1]],
                   popup="BARCELONA (BCN)", tooltip="BARCELONA (BCN)").add_to(m)
     colormap.add_to(m)
-    return m
+    return m, laag
+
+#---------------------------------------------------------------------------
+# Straal van de aarde in km, voor het omrekenen van afstanden in radialen
+AARDE_STRAAL_KM = 6371
+
+# Functie om een ruimtelijke index (BallTree met haversine-afstand) over alle punten van alle vluchten te bouwen.
+# Geeft de boom terug en per punt in de boom de rij in het lange frame.
+@st.cache_resource(max_entries=1)
+def load_ruimtelijke_index(signatuur):
+    alle = load_alle_vluchten(signatuur)
+    lat = alle['[3d Latitude]'].to_numpy(dtype='float64')
+    lon = alle['[3d Longitude]'].to_numpy(dtype='float64')
+    rijen = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    boom = BallTree(np.radians(np.column_stack([lat[rijen], lon[rijen]])), metric='haversine')
+    return boom, rijen
+
+# Functie die het dichtstbijzijnde punt (van alle vluchten) bij een locatie geeft: (rij in het lange frame, afstand in km)
+def dichtstbijzijnde_punt(index, lat, lon):
+    boom, rijen = index
+    afstand, positie = boom.query(np.radians([[lat, lon]]), k=1)
+    return rijen[positie[0, 0]], afstand[0, 0] * AARDE_STRAAL_KM
+
+# Functie die de rijen (in het lange frame) geeft van alle punten binnen een straal (km) rond een locatie
+def punten_binnen_straal(index, lat, lon, straal_km):
+    boom, rijen = index
+    positie = boom.query_radius(np.radians([[lat, lon]]), r=straal_km / AARDE_STRAAL_KM)[0]
+    return np.sort(rijen[positie])
+
+# Functie die de rijen geeft van alle punten binnen een kader (zuid, west, noord, oost in graden).
+# De boom zoekt eerst binnen de cirkel rond het kader, daarna wordt precies op het kader gefilterd.
+def punten_in_kader(alle, index, zuid, west, noord, oost):
+    midden_lat, midden_lon = (zuid + noord) / 2, (west + oost) / 2
+    straal_km = max(haversine(midden_lat, midden_lon, lat, lon) for lat in (zuid, noord) for lon in (west, oost))
+    kandidaten = punten_binnen_straal(index, midden_lat, midden_lon, straal_km + 1e-6)
+    lat = alle['[3d Latitude]'].to_numpy()[kandidaten]
+    lon = alle['[3d Longitude]'].to_numpy()[kandidaten]
+    return kandidaten[(lat >= zuid) & (lat <= noord) & (lon >= west) & (lon <= oost)]
+
+# Functie die per vlucht het dichtstbijzijnde punt binnen een straal (km) rond een locatie geeft
+def vluchten_binnen_straal(alle, index, lat, lon, straal_km):
+    rijen = punten_binnen_straal(index, lat, lon, straal_km)
+    punten = alle.iloc[rijen][['vlucht', 'Time (secs)', '[3d Latitude]', '[3d Longitude]', '[3d Altitude Ft]']]
+    punten = punten.assign(**{'Afstand (km)': haversine(lat, lon, punten['[3d Latitude]'], punten['[3d Longitude]'])})
+    dichtstbij = punten.sort_values('Afstand (km)').drop_duplicates('vlucht')
+    return dichtstbij.sort_values('vlucht').reset_index(drop=True)
+
+#---------------------------------------------------------------------------
+# Functie voor het live volgen van een groeiend trackbestand (CSV of NDJSON).
+# Wordt als fragment uitgevoerd: alleen dit deel van de pagina draait elke interval opnieuw.
+# Alleen de nieuwe regels worden gelezen en aan de track in de sessie toegevoegd. De basiskaart wordt elke tick
+# opnieuw (en steeds gelijk) gemaakt vanaf de onthouden beginstand; st_folium voegt de FeatureGroup met de route
+# aan die kaart toe, dus een bewaarde kaart zou de route van de vorige tick meenemen en bij elke tick een nieuwe
+# sleutel krijgen. Nu blijft de sleutel gelijk en wordt in de browser alleen de laag met de route vervangen,
+# zodat zoom en positie van de gebruiker blijven staan.
+def toon_live_track(pad):
+    status = st.session_state.get('live_track')
+    if status is None or status['pad'] != pad:
+        status = {'pad': pad, 'positie': 0, 'kolommen': None, 'track': None, 'locatie': None}
+        st.session_state['live_track'] = status
+
+    oude_positie = status['positie']
+    nieuw, status['positie'], status['kolommen'] = lees_nieuwe_regels(pad, status['positie'], status['kolommen'])
+    if status['positie'] < oude_positie:
+        # Het bestand is opnieuw begonnen
+        status['track'] = None
+        status['locatie'] = None
+    nieuw = nieuw.dropna(subset=['[3d Latitude]', '[3d Longitude]'])
+    if len(nieuw):
+        status['track'] = nieuw if status['track'] is None else pd.concat([status['track'], nieuw], ignore_index=True)
+
+    track = status['track']
+    if track is None or track.empty:
+        st.info(f"Wachten op punten in {pad} ...")
+        return
+
+    if status['locatie'] is None:
+        status['locatie'] = [float(track['[3d Latitude]'].iloc[0]), float(track['[3d Longitude]'].iloc[0])]
+    kaart = folium.Map(location=status['locatie'], zoom_start=6, tiles='CartoDB positron')
+
+    laag = folium.FeatureGroup(name='Live route')
+    route_laag(track, 'hoogte', maak_colormap(track, 'hoogte')).add_to(laag)
+    laatste = track.iloc[-1]
+    folium.CircleMarker(location=[laatste['[3d Latitude]'], laatste['[3d Longitude]']], radius=6, color='red',
+                        fill=True, tooltip=f"Time: {laatste['Time (secs)']:g} sec, Altitude: {laatste['[3d Altitude Ft]']:.0f} ft").add_to(laag)
+    st_folium(kaart, feature_group_to_add=laag, key='live_kaart', width=700, height=500, returned_objects=[])
+
+    st.caption(f"{len(track)} punten ontvangen, laatste tijdstip {laatste['Time (secs)']:g} sec")
+    fig = px.line(track, x=track['Time (secs)'] / 3600, y='[3d Altitude Ft]', title='Hoogte vs Tijd (live)',
+                  labels={'x': 'Tijd (uren)', '[3d Altitude Ft]': 'Hoogte (ft)'})
+    st.plotly_chart(fig)
+
+#---------------------------------------------------------------------------
+# Detailniveaus per vlucht: (horizontale tolerantie in km, verticale tolerantie in ft).
+# Niveau 0 is de volledige resolutie, elk volgend niveau is grover.
+DETAILNIVEAUS = [(0, 0), (0.25, 100), (1, 300), (4, 1000), (15, 3000)]
+
+# Functie voor Douglas-Peucker vereenvoudiging van een lijn door de punten (x, y).
+# Met loodrecht=False wordt de verticale afwijking t.o.v. de koorde gebruikt (voor tijdreeksen).
+# Geeft een boolean masker terug met de punten die behouden blijven.
+def douglas_peucker(x, y, tolerantie, loodrecht=True):
+    n = len(x)
+    behouden = np.zeros(n, dtype=bool)
+    if n <= 2 or tolerantie <= 0:
+        behouden[:] = True
+        return behouden
+    behouden[0] = behouden[-1] = True
+
+    stapel = [(0, n - 1)]
+    while stapel:
+        begin, eind = stapel.pop()
+        if eind - begin < 2:
+            continue
+        dx, dy = x[eind] - x[begin], y[eind] - y[begin]
+        px, py = x[begin + 1:eind] - x[begin], y[begin + 1:eind] - y[begin]
+        if not loodrecht and dx != 0:
+            afstand = np.abs(py - px * (dy / dx))
+        elif dx == 0 and dy == 0:
+            afstand = np.hypot(px, py)
+        else:
+            afstand = np.abs(px * dy - py * dx) / np.hypot(dx, dy)
+        k = int(np.argmax(afstand))
+        if afstand[k] > tolerantie:
+            midden = begin + 1 + k
+            behouden[midden] = True
+            stapel.append((begin, midden))
+            stapel.append((midden, eind))
+    return behouden
+
+# Functie om een vluchtroute te vereenvoudigen met behoud van de vorm en de hoogte-extremen.
+# De route wordt horizontaal (lat/lon in km) én verticaal (hoogte tegen tijd) vereenvoudigd;
+# een punt blijft staan als één van beide het nodig heeft. Geeft de behouden rij-indices terug.
+def vereenvoudig_track(df, tolerantie_km, tolerantie_ft):
+    lat = np.radians(df['[3d Latitude]'].to_numpy(dtype='float64'))
+    lon = np.radians(df['[3d Longitude]'].to_numpy(dtype='float64'))
+    hoogte = df['[3d Altitude Ft]'].to_numpy(dtype='float64')
+    tijd = df['Time (secs)'].to_numpy(dtype='float64')
+
+    # Equirectangulaire projectie naar km rond de gemiddelde breedtegraad
+    x = 6371 * lon * np.cos(np.nanmean(lat))
+    y = 6371 * lat
+    behouden = douglas_peucker(x, y, tolerantie_km) | douglas_peucker(tijd, hoogte, tolerantie_ft, loodrecht=False)
+
+    # Hoogste en laagste punt altijd behouden
+    if len(hoogte) and not np.isnan(hoogte).all():
+        behouden[np.nanargmax(hoogte)] = True
+        behouden[np.nanargmin(hoogte)] = True
+    return np.flatnonzero(behouden)
+
+# Functie om voor alle vluchten de detailniveaus vooraf te berekenen
+@st.cache_data
+def bereken_detailniveaus(signatuur):
+    return {
+        vlucht: [vereenvoudig_track(df, tol_km, tol_ft) for tol_km, tol_ft in DETAILNIVEAUS]
+        for vlucht, df in load_vluchten_data(signatuur).items()
+    }
+
+# Functie om een detailniveau te kiezen op basis van het zoomniveau van de kaart en/of een puntenbudget.
+# Bij een zoomniveau wordt het grofste niveau gekozen waarvan de tolerantie kleiner is dan één pixel.
+# Geeft het nummer van het niveau in DETAILNIVEAUS; kies_detailniveau geeft direct de rijen.
+def detailniveau_nummer(niveaus, zoom=None, max_punten=None):
+    keuze = 0
+    if zoom is not None:
+        km_per_pixel = 40075 * np.cos(np.radians(45)) / (256 * 2 ** zoom)
+        keuze = max(i for i, (tol_km, _) in enumerate(DETAILNIVEAUS) if tol_km <= km_per_pixel)
+    if max_punten is not None:
+        while keuze < len(niveaus) - 1 and len(niveaus[keuze]) > max_punten:
+            keuze += 1
+    return keuze
+
+def kies_detailniveau(niveaus, zoom=None, max_punten=None):
+    return niveaus[detailniveau_nummer(niveaus, zoom, max_punten)]
+
+# Functie die met Largest-Triangle-Three-Buckets (LTTB) n_uit punten van een tijdreeks kiest.
+# Het eerste en laatste punt blijven staan; uit elke bucket daartussen wordt het punt gekozen dat de grootste
+# driehoek maakt met het vorige gekozen punt en het gemiddelde van de volgende bucket. Geeft de gekozen rijen.
+def lttb(x, y, n_uit):
+    n = len(x)
+    if n_uit >= n or n_uit < 3:
+        return np.arange(n)
+
+    grenzen = np.linspace(1, n - 1, n_uit - 1).astype(int)
+    gekozen = np.empty(n_uit, dtype=int)
+    gekozen[0], gekozen[-1] = 0, n - 1
+    vorige = 0
+    for i in range(n_uit - 2):
+        begin, eind = grenzen[i], grenzen[i + 1]
+        volgende = slice(eind, grenzen[i + 2]) if i + 2 < len(grenzen) else slice(n - 1, n)
+        gem_x, gem_y = x[volgende].mean(), y[volgende].mean()
+        oppervlak = np.abs((x[vorige] - gem_x) * (y[begin:eind] - y[vorige])
+                           - (x[vorige] - x[begin:eind]) * (gem_y - y[vorige]))
+        vorige = begin + np.argmax(oppervlak)
+        gekozen[i + 1] = vorige
+    return gekozen
+
+# Functie voor een met LTTB verkleinde tijdreeks van één vlucht binnen een tijdvenster (uren).
+# Hoe kleiner het venster, hoe meer van de volledige resolutie binnen het puntenbudget past.
+@st.cache_data
+def load_lttb_reeks(signatuur, vlucht, kolom, venster, max_punten):
+    df = load_vluchten_data(signatuur)[vlucht]
+    x = df['Time (hours)'].to_numpy(dtype='float64')
+    y = df[kolom].to_numpy(dtype='float64')
+    binnen = np.flatnonzero((x >= venster[0]) & (x <= venster[1]) & ~np.isnan(y))
+    keuze = binnen[lttb(x[binnen], y[binnen], max_punten)]
+    return x[keuze], y[keuze]
+
+#---------------------------------------------------------------------------
+# Functie om de haversine afstand te berekenen tussen twee punten (werkt ook op hele arrays)
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371  # Aarde's straal in kilometers
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = np.radians(lat2 - lat1)
+    delta_lambda = np.radians(lon2 - lon1)
+
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c  # Afstand in kilometers
+
+# Functie voor de beginkoers (in radialen t.o.v. het noorden) van punt 1 naar punt 2 (werkt ook op hele arrays)
+def peiling(lat1, lon1, lat2, lon2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    delta_lambda = np.radians(lon2 - lon1)
+    return np.arctan2(np.sin(delta_lambda) * np.cos(phi2),
+                      np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(delta_lambda))
+
+# Functie om de metrieken van alle vluchten in één keer te berekenen.
+# In het lange frame staan alle routes achter elkaar; de verschillen tussen opeenvolgende punten worden
+# met NumPy over de hele array berekend en het eerste punt van elke vlucht heeft geen vorig punt.
+def bereken_vluchtmetrieken(alle):
+    grenzen = vlucht_grenzen(alle)
+    lengtes = np.array([stop - start for start, stop in grenzen.values()])
+
+    lat = alle['[3d Latitude]'].to_numpy(dtype='float64')
+    lon = alle['[3d Longitude]'].to_numpy(dtype='float64')
+    hoogte = alle['[3d Altitude Ft]'].to_numpy(dtype='float64')
+    tijd = alle['Time (secs)'].to_numpy(dtype='float64')
+
+    starts = np.array([start for start, stop in grenzen.values()])
+    eerste_punt = np.zeros(len(alle), dtype=bool)
+    eerste_punt[starts[lengtes > 0]] = True
+
+    # Afstand (km) en tijdsverschil (s) t.o.v. het vorige punt
+    afstand = np.zeros(len(alle))
+    afstand[1:] = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    afstand[eerste_punt] = 0
+    dt = np.full(len(alle), np.nan)
+    dt[1:] = np.diff(tijd)
+    dt[eerste_punt | (dt <= 0)] = np.nan
+
+    # Cumulatieve afstand per vlucht: totale cumsum min de stand aan het begin van de vlucht
+    cumulatief = np.cumsum(np.nan_to_num(afstand))
+    cumulatief -= np.repeat(cumulatief[starts] - np.nan_to_num(afstand[starts]), lengtes)
+
+    # Grondsnelheid (knots), verticale snelheid (ft/min) en koers (graden t.o.v. het noorden)
+    grondsnelheid = afstand / dt * 3600 / 1.852
+    verticale_snelheid = np.full(len(alle), np.nan)
+    verticale_snelheid[1:] = np.diff(hoogte)
+    verticale_snelheid = verticale_snelheid / dt * 60
+    koers = np.full(len(alle), np.nan)
+    koers[1:] = np.degrees(peiling(lat[:-1], lon[:-1], lat[1:], lon[1:])) % 360
+    koers[eerste_punt] = np.nan
+
+    return pd.DataFrame({
+        'vlucht': alle['vlucht'].array,
+        'Time (secs)': tijd,
+        'Afstand (km)': afstand,
+        'Cumulatieve afstand (km)': cumulatief,
+        'Grondsnelheid (knots)': grondsnelheid,
+        'Verticale snelheid (ft/min)': verticale_snelheid,
+        'Koers (graden)': koers
+    })
+
+# Functie voor laden van de vluchtmetrieken van alle vluchten
+@st.cache_data
+def load_vluchtmetrieken(signatuur):
+    return bereken_vluchtmetrieken(load_alle_vluchten(signatuur))
+
+# Functie die een masker geeft van het eerste punt van elke vlucht in het lange frame
+def eerste_punten(alle):
+    masker = np.zeros(len(alle), dtype=bool)
+    masker[[start for start, stop in vlucht_grenzen(alle).values() if stop > start]] = True
+    return masker
+
+# Functie voor run-length encoding: begin en lengte van elke reeks gelijke codes.
+# Bij nieuw_begin start altijd een nieuwe reeks (bijvoorbeeld aan het begin van een vlucht).
+def run_lengtes(codes, nieuw_begin):
+    wissel = np.ones(len(codes), dtype=bool)
+    wissel[1:] = (codes[1:] != codes[:-1]) | nieuw_begin[1:]
+    begin = np.flatnonzero(wissel)
+    return begin, np.diff(np.append(begin, len(codes)))
+
+# Drempels voor de vluchtfasen: verticale snelheid (ft/min) voor klim/daling, hoogte (ft) waaronder
+# een vliegtuig zonder klim of daling op de grond staat, en het minimale aantal samples van een fase
+FASE_VERTICALE_SNELHEID = 300
+FASE_GRONDHOOGTE = 500
+FASE_MIN_SAMPLES = 3
+
+# Functie om elk punt van alle vluchten een fasecode te geven (zie VLUCHTFASEN).
+# Fasen korter dan FASE_MIN_SAMPLES worden met run-length encoding bij de vorige fase gevoegd,
+# zodat ruis in de verticale snelheid geen losse stukjes klim of daling oplevert.
+def bepaal_vluchtfasen(alle, metrieken):
+    hoogte = alle['[3d Altitude Ft]'].to_numpy(dtype='float64')
+    vs = metrieken['Verticale snelheid (ft/min)'].to_numpy(dtype='float64')
+    begin_vlucht = eerste_punten(alle)
+
+    codes = np.full(len(alle), VLUCHTFASEN.index('kruis'), dtype=np.int8)
+    codes[vs > FASE_VERTICALE_SNELHEID] = VLUCHTFASEN.index('klim')
+    codes[vs < -FASE_VERTICALE_SNELHEID] = VLUCHTFASEN.index('daling')
+    codes[(hoogte < FASE_GRONDHOOGTE) & ~(np.abs(vs) > FASE_VERTICALE_SNELHEID)] = VLUCHTFASEN.index('grond')
+
+    # Korte reeksen (behalve de eerste van een vlucht) krijgen de fase van de reeks ervoor
+    begin, lengte = run_lengtes(codes, begin_vlucht)
+    reeks_codes = pd.Series(codes[begin], dtype='float64')
+    reeks_codes[(lengte < FASE_MIN_SAMPLES) & ~begin_vlucht[begin]] = np.nan
+    return np.repeat(reeks_codes.ffill().to_numpy(dtype=np.int8), lengte)
+
+# Functie om de fasegrenzen per vlucht te bepalen: één rij per aaneengesloten fase.
+# Een fase loopt door tot het eerste punt van de volgende fase in dezelfde vlucht.
+def bereken_fasegrenzen(alle, codes):
+    tijd = alle['Time (secs)'].to_numpy(dtype='float64')
+    begin_vlucht = eerste_punten(alle)
+    begin, lengte = run_lengtes(codes, begin_vlucht)
+    eind = begin + lengte - 1
+
+    volgende = np.minimum(begin + lengte, len(codes) - 1)
+    loopt_door = (begin + lengte < len(codes)) & ~begin_vlucht[volgende]
+    eind_tijd = np.where(loopt_door, tijd[volgende], tijd[eind])
+
+    return pd.DataFrame({
+        'vlucht': alle['vlucht'].array[begin],
+        'fase': pd.Categorical.from_codes(codes[begin], categories=VLUCHTFASEN),
+        'begin_index': begin,
+        'eind_index': eind,
+        'begin (s)': tijd[begin],
+        'eind (s)': eind_tijd,
+        'duur (min)': (eind_tijd - tijd[begin]) / 60
+    })
+
+# Functie voor laden van de fasecodes (per punt) en fasegrenzen (per fase) van alle vluchten
+@st.cache_data
+def load_vluchtfasen(signatuur):
+    alle = load_alle_vluchten(signatuur)
+    codes = bepaal_vluchtfasen(alle, load_vluchtmetrieken(signatuur))
+    return codes, bereken_fasegrenzen(alle, codes)
+
+# Functie om voor alle punten van alle vluchten de afwijking (km) van de grootcirkel tussen het eerste
+# en laatste punt van de vlucht te berekenen. De cross-track afstand wordt in één keer over de hele
+# array berekend; positief is rechts van de directe route, negatief links.
+def bereken_corridorafwijking(alle):
+    grenzen = [(start, stop) for start, stop in vlucht_grenzen(alle).values() if stop > start]
+    starts = np.array([start for start, stop in grenzen], dtype=int)
+    eindes = np.array([stop - 1 for start, stop in grenzen], dtype=int)
+    lengtes = eindes - starts + 1
+
+    lat = alle['[3d Latitude]'].to_numpy(dtype='float64')
+    lon = alle['[3d Longitude]'].to_numpy(dtype='float64')
+    lat_begin, lon_begin = np.repeat(lat[starts], lengtes), np.repeat(lon[starts], lengtes)
+    lat_eind, lon_eind = np.repeat(lat[eindes], lengtes), np.repeat(lon[eindes], lengtes)
+
+    hoek_afstand = haversine(lat_begin, lon_begin, lat, lon) / AARDE_STRAAL_KM
+    hoek_verschil = peiling(lat_begin, lon_begin, lat, lon) - peiling(lat_begin, lon_begin, lat_eind, lon_eind)
+    return np.arcsin(np.sin(hoek_afstand) * np.sin(hoek_verschil)) * AARDE_STRAAL_KM
+
+# Functie voor laden van de afwijking van de directe route voor alle punten
+@st.cache_data
+def load_corridorafwijking(signatuur):
+    return bereken_corridorafwijking(load_alle_vluchten(signatuur))
+
+# Functie voor de afwijking van de directe route langs de afgelegde afstand, per vlucht met LTTB verkleind tot
+# max_punten. Geeft per vlucht (afstand, afwijking), zodat de grafiek niet alle punten naar de browser stuurt.
+@st.cache_data
+def load_corridor_reeksen(signatuur, max_punten):
+    afstand = load_vluchtmetrieken(signatuur)['Cumulatieve afstand (km)'].to_numpy(dtype='float64')
+    afwijking = load_corridorafwijking(signatuur)
+    reeksen = {}
+    for vlucht, (start, stop) in vlucht_grenzen(load_alle_vluchten(signatuur)).items():
+        x, y = afstand[start:stop], afwijking[start:stop]
+        geldig = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        keuze = geldig[lttb(x[geldig], y[geldig], max_punten)]
+        reeksen[vlucht] = (x[keuze], y[keuze])
+    return reeksen
+
+# Functie om de totale afstand (km) per vlucht te bepalen uit de metrieken
+def bereken_totale_afstand(metrieken):
+    return metrieken.groupby('vlucht', observed=True)['Cumulatieve afstand (km)'].last()
+
+# Functie om de vluchtduur (uren) per vlucht te bepalen uit de metrieken
+def bereken_vluchtduur(metrieken):
+    tijd = metrieken.groupby('vlucht', observed=True)['Time (secs)']
+    return (tijd.last() - tijd.first()) / 3600
+
+# Functie om per vlucht het vertrektijdstip (s) te bepalen: het begin van de eerste fase na 'grond', dus het
+# einde van het taxiën. Een vlucht die nooit loskomt valt terug op het eerste punt.
+def bereken_vertrektijden(alle, fasegrenzen):
+    in_de_lucht = fasegrenzen[fasegrenzen['fase'] != 'grond']
+    vertrek = in_de_lucht.groupby('vlucht', observed=True)['begin (s)'].min()
+    eerste = alle.groupby('vlucht', observed=True)['Time (secs)'].first().astype('float64')
+    return vertrek.reindex(eerste.index).fillna(eerste)
+
+# Functie om de samenvatting per vlucht te maken (één rij per vlucht).
+# Kruishoogte is hier alles vanaf 95% van de maximale hoogte van die vlucht; de tijd tot kruishoogte
+# wordt gemeten vanaf het vertrek (zie bereken_vertrektijden), zodat het taxiën niet meetelt.
+def bouw_vluchtsamenvatting(alle, metrieken, fasegrenzen, corridorafwijking):
+    groep = alle.groupby('vlucht', observed=True)
+    tijd = groep['Time (secs)']
+
+    op_kruishoogte = alle['[3d Altitude Ft]'] >= 0.95 * groep['[3d Altitude Ft]'].transform('max')
+    kruis_tijd = alle['Time (secs)'].where(op_kruishoogte).groupby(alle['vlucht'], observed=True)
+
+    samenvatting = pd.DataFrame({
+        'Afstand (km)': bereken_totale_afstand(metrieken),
+        'Vluchtduur (uren)': bereken_vluchtduur(metrieken),
+        'Max hoogte (ft)': groep['[3d Altitude Ft]'].max(),
+        'Gemiddelde hoogte (ft)': groep['[3d Altitude Ft]'].mean(),
+        'Max TAS (knots)': groep['TRUE AIRSPEED (derived)'].max(),
+        'Tijd tot kruishoogte (min)': (kruis_tijd.min() - bereken_vertrektijden(alle, fasegrenzen)) / 60,
+        'Daaltijd (min)': (tijd.last() - kruis_tijd.max()) / 60
+    })
+
+    # Afwijking van de directe route (grootcirkel tussen het eerste en laatste punt)
+    eerste, laatste = groep[['[3d Latitude]', '[3d Longitude]']].first(), groep[['[3d Latitude]', '[3d Longitude]']].last()
+    samenvatting['Grootcirkel (km)'] = haversine(eerste['[3d Latitude]'], eerste['[3d Longitude]'],
+                                                 laatste['[3d Latitude]'], laatste['[3d Longitude]'])
+    samenvatting['Extra afstand (km)'] = samenvatting['Afstand (km)'] - samenvatting['Grootcirkel (km)']
+    samenvatting['Max afwijking (km)'] = pd.Series(np.abs(corridorafwijking)).groupby(alle['vlucht'].array, observed=True).max()
+
+    # Totale duur per vluchtfase
+    faseduur = fasegrenzen.pivot_table(index='vlucht', columns='fase', values='duur (min)',
+                                       aggfunc='sum', fill_value=0, observed=False)
+    for fase in VLUCHTFASEN:
+        samenvatting[f'Duur {fase} (min)'] = faseduur[fase]
+    samenvatting.index = samenvatting.index.astype(str)
+    return samenvatting.rename_axis('vlucht').reset_index()
+
+# Functie om alle vluchten in één keer te interpoleren op een gemeenschappelijk raster.
+# uitlijning 'tijd': seconden sinds het vertrek (zie bereken_vertrektijden), zodat verschillen in taxitijd de
+# klim niet verschuiven (na de landing NaN);
+# uitlijning 'afstand': afgelegde afstand als fractie (0-1) van de totale afstand van de vlucht.
+# Geeft het raster en een matrix (vluchten x samples) terug.
+def resample_vluchten(alle, metrieken, fasegrenzen, uitlijning='tijd', n_samples=200):
+    grenzen = vlucht_grenzen(alle)
+    lengtes = np.array([stop - start for start, stop in grenzen.values()])
+    starts = np.array([start for start, stop in grenzen.values()])
+    codes = np.repeat(np.arange(len(grenzen)), lengtes)
+
+    if uitlijning == 'tijd':
+        x = metrieken['Time (secs)'].to_numpy(dtype='float64')
+        vertrek = bereken_vertrektijden(alle, fasegrenzen).reindex(list(grenzen)).to_numpy()
+        # Punten tijdens het taxiën krijgen een negatieve tijd en vallen buiten het raster
+        x = x - np.repeat(vertrek, lengtes)
+        raster = np.linspace(0, np.nanmax(x), n_samples)
+    else:
+        cumulatief = metrieken['Cumulatieve afstand (km)'].to_numpy(dtype='float64')
+        totaal = np.repeat(cumulatief[starts + lengtes - 1], lengtes)
+        x = np.divide(cumulatief, totaal, out=np.zeros_like(cumulatief), where=totaal > 0)
+        raster = np.linspace(0, 1, n_samples)
+    y = alle['[3d Altitude Ft]'].to_numpy(dtype='float64')
+
+    # Met een verschuiving per vlucht worden alle x-waarden samen één oplopende reeks,
+    # zodat één searchsorted het rechter buurpunt voor elk (vlucht, rasterpunt) vindt.
+    verschuiving = np.nanmax(x) - min(np.nanmin(x), 0) + 1
+    sleutel = codes * verschuiving + x
+    doel_x = np.tile(raster, len(grenzen))
+    doel_vlucht = np.repeat(np.arange(len(grenzen)), n_samples)
+    pos = np.searchsorted(sleutel, doel_vlucht * verschuiving + doel_x, side='right')
+
+    links = np.clip(pos - 1, 0, len(x) - 1)
+    rechts = np.clip(pos, 0, len(x) - 1)
+    binnen = (pos < len(x)) & (codes[rechts] == doel_vlucht)
+    x0, x1 = x[links], x[rechts]
+    gewicht = np.zeros(len(doel_x))
+    np.divide(doel_x - x0, x1 - x0, out=gewicht, where=binnen & (x1 > x0))
+    waarden = y[links] + gewicht * (y[rechts] - y[links])
+
+    # Rasterpunten na het laatste punt van een vlucht hebben geen waarde
+    waarden[~binnen & (doel_x > x0)] = np.nan
+    return raster, waarden.reshape(len(grenzen), n_samples)
+
+# Functie voor laden van de uitgelijnde vluchten (raster + matrix)
+@st.cache_data
+def load_uitgelijnde_vluchten(signatuur, uitlijning, n_samples=200):
+    return resample_vluchten(load_alle_vluchten(signatuur), load_vluchtmetrieken(signatuur),
+                             load_vluchtfasen(signatuur)[1], uitlijning, n_samples)
+
+# Maximaal aantal uitschieters per vlucht dat in de boxplot wordt getekend
+BOX_MAX_UITSCHIETERS = 50
+
+# Functie om per vlucht de statistieken voor een boxplot te berekenen, zoals Plotly dat zelf zou doen:
+# kwartielen met lineaire interpolatie en snorharen tot het verste punt binnen 1,5 x de interkwartielafstand.
+# Van de punten daarbuiten wordt per vlucht een vaste steekproef van hoogstens max_uitschieters bewaard.
+# Geeft de statistieken per vlucht en een frame met de uitschieters (vlucht, waarde).
+def bereken_boxstatistieken(alle, kolom, max_uitschieters=BOX_MAX_UITSCHIETERS):
+    groep = alle[kolom].astype('float64').groupby(alle['vlucht'], observed=True)
+    stats = groep.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'mediaan', 'q3']
+    iqr = stats['q3'] - stats['q1']
+
+    # Grenzen per vlucht naar elk punt uitrollen en in één keer vergelijken
+    vlucht = alle['vlucht'].array
+    waarden = alle[kolom].to_numpy(dtype='float64')
+    laag = (stats['q1'] - 1.5 * iqr).reindex(vlucht).to_numpy()
+    hoog = (stats['q3'] + 1.5 * iqr).reindex(vlucht).to_numpy()
+    binnen = (waarden >= laag) & (waarden <= hoog)
+    snorharen = pd.Series(waarden[binnen]).groupby(vlucht[binnen], observed=True).agg(['min', 'max'])
+    stats['onder'], stats['boven'] = snorharen['min'], snorharen['max']
+
+    buiten = np.flatnonzero(~binnen & ~np.isnan(waarden))
+    buiten = buiten[np.random.default_rng(0).permutation(len(buiten))]
+    uitschieters = pd.DataFrame({'vlucht': vlucht[buiten], 'waarde': waarden[buiten]})
+    uitschieters = uitschieters[uitschieters.groupby('vlucht', observed=True).cumcount() < max_uitschieters]
+    return stats, uitschieters
+
+# Functie voor laden van de boxplot-statistieken van alle vluchten voor een kolom
+@st.cache_data
+def load_boxstatistieken(signatuur, kolom):
+    return bereken_boxstatistieken(load_alle_vluchten(signatuur), kolom)
+
+# Functie voor laden van de samenvatting per vlucht.
+# De samenvatting wordt naast de parquet-kopieën bewaard en blijft geldig tot een bronbestand wijzigt,
+# zodat de tracks zelf niet meer doorlopen hoeven te worden. Verhoog SAMENVATTING_VERSIE als de
+# berekening of de kolommen van de samenvatting veranderen, dan wordt de kopie opnieuw gebouwd.
+SAMENVATTING_VERSIE = 3
+
+@st.cache_data
+def load_vluchtsamenvatting(signatuur):
+    samenvatting = lees_of_bouw_parquet(
+        'vluchten_samenvatting', f'{signatuur}-v{SAMENVATTING_VERSIE}',
+        lambda: bouw_vluchtsamenvatting(load_alle_vluchten(signatuur), load_vluchtmetrieken(signatuur),
+                                        load_vluchtfasen(signatuur)[1], load_corridorafwijking(signatuur))
+    )
+    return samenvatting.set_index('vlucht')
+
+# Bestand met de vliegtuigbewegingen per luchthaven
+LUCHTHAVEN_BESTAND = "DatasetLuchthaven_murged2.csv"
+
+# Functie voor de signatuur van het luchthavenbestand
+def luchthaven_signatuur():
+    return bron_signatuur([LUCHTHAVEN_BESTAND])
+
+# Functie voor laden van de luchthavendata in compacte datatypes (datums en kommagetallen al omgezet).
+# Het frame wordt gedeeld tussen alle sessies (cache_resource) en mag dus niet worden aangepast;
+# bij een koude start wordt de parquet-kopie gelezen in plaats van de CSV. Alleen de laatste signatuur blijft
+# bewaard, zodat een aangevuld bestand het oude frame niet in het geheugen laat staan.
+@st.cache_resource(max_entries=1)
+def load_luchthaven_data(signatuur):
+    return lees_luchthaven_bestand(LUCHTHAVEN_BESTAND)
+
+# Precisie (aantal bits voor het register) van de HyperLogLog-schetsen: 2^8 registers, ongeveer 6,5% fout
+HLL_PRECISIE = 8
+
+# Tabel met 2^-r voor elke mogelijke registerwaarde r (0 t/m 64), zodat de schatting zonder machten kan
+HLL_MACHTEN = np.exp2(-np.arange(65))
+
+# Functie om per (LSV, luchthaven, TAR) het eerste tijdstip (STD) te bepalen waarop het vliegtuig gezien is.
+# Het aantal verschillende vliegtuigen tot een tijdstip is het aantal eerste keren tot dat tijdstip.
+def eerste_keer_gezien(df, kolom):
+    bewegingen = df[df['STD'].notna()]
+    return bewegingen.groupby(['LSV', kolom, 'TAR'], observed=True)['STD'].min()
+
+# Functie om de eerste keren bij te werken met nieuwe bewegingen; alleen de nieuwe rijen worden gegroepeerd
+def werk_eerste_keer_bij(eerste, nieuw, kolom):
+    if nieuw.empty:
+        return eerste
+    return pd.concat([eerste, eerste_keer_gezien(nieuw, kolom)]).groupby(level=[0, 1, 2], observed=True).min()
+
+# Functie om per luchthaven (kolom) en per dag het cumulatieve aantal verschillende vliegtuigen (TAR) te
+# berekenen dat er geland (L) en vertrokken (S) is, uit de eerste keren dat elk vliegtuig gezien is.
+# Dag d bevat alle bewegingen met STD tot en met middernacht aan het begin van d. Het aantal voor een datum
+# is daarmee één rij uit de matrix. Geeft de dagen, de luchthavens en de matrices geland/vertrokken (dag x luchthaven).
+# Met freq (bijvoorbeeld 'h') kan in kleinere stappen dan een dag worden geteld.
+def bouw_drukte_index(eerste, freq='D'):
+    plaatsen = pd.Index(eerste.index.get_level_values(1).unique()).sort_values()
+    if eerste.empty:
+        leeg = np.zeros((0, len(plaatsen)), dtype=np.int32)
+        return pd.DatetimeIndex([]), plaatsen, leeg, leeg
+    dagen = pd.date_range(eerste.min().ceil(freq), eerste.max().ceil(freq), freq=freq)
+
+    def cumulatief(lsv):
+        per_lsv = eerste[eerste.index.get_level_values(0) == lsv]
+        dag = dagen.searchsorted(per_lsv.dt.ceil(freq))
+        plaats = plaatsen.get_indexer(per_lsv.index.get_level_values(1))
+        telling = np.bincount(dag * len(plaatsen) + plaats, minlength=len(dagen) * len(plaatsen))
+        return telling.reshape(len(dagen), len(plaatsen)).cumsum(axis=0).astype(np.int32)
+
+    return dagen, plaatsen, cumulatief('L'), cumulatief('S')
+
+# Functie om met HyperLogLog het aantal verschillende waarden te schatten uit registers (laatste as = registers)
+def hll_schatting(registers):
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    schatting = alpha * m * m / HLL_MACHTEN[registers].sum(axis=-1)
+    nullen = np.sum(registers == 0, axis=-1)
+    # Correctie voor kleine aantallen (linear counting)
+    klein = (schatting <= 2.5 * m) & (nullen > 0)
+    return np.where(klein, m * np.log(m / np.maximum(nullen, 1)), schatting)
+
+# Functie om per waarde (TAR) het HyperLogLog-register en de rang (positie van de eerste 1-bit) te bepalen
+def hll_register_rang(waarden, precisie=HLL_PRECISIE):
+    hashes = pd.util.hash_array(waarden.astype(str).to_numpy())
+    register = (hashes >> np.uint64(64 - precisie)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precisie)) - 1)
+    # bit_length van de rest via de exponent van frexp, per 32 bits zodat de omzetting naar float exact is
+    hoog = (rest >> np.uint64(32)).astype('float64')
+    laag = (rest & np.uint64(0xFFFFFFFF)).astype('float64')
+    lengte = np.where(hoog > 0, np.frexp(hoog)[1] + 32, np.frexp(laag)[1])
+    return register, (64 - precisie + 1 - lengte).astype(np.uint8)
+
+# Functie om van kandidaat-trappen alleen de echte trappen te houden: per (LSV, luchthaven, register) de
+# tijdstippen waarop de rang hoger is dan alle eerdere
+def houd_hll_trappen(kandidaten, kolom):
+    kandidaten = kandidaten.sort_values(['STD', 'rang'], ascending=[True, False], kind='stable')
+    kandidaten['hoogste'] = kandidaten.groupby(['LSV', kolom, 'register'], observed=True)['rang'].cummax()
+    trappen = kandidaten[~kandidaten.duplicated(['LSV', kolom, 'register', 'hoogste'])]
+    return trappen.drop(columns='hoogste').reset_index(drop=True)
+
+# Functie om de HyperLogLog-trappen van de bewegingen te bepalen, per luchthaven (kolom) en register.
+# Het register op een tijdstip is de hoogste rang tot dan toe, dus alleen de bewegingen waarop het register
+# hoger wordt zijn nodig. Dat zijn er per register maar een paar; het aantal groeit alleen logaritmisch met het
+# aantal vliegtuigen, terwijl de eerste keren (zie eerste_keer_gezien) lineair groeien.
+def hll_trappen(df, kolom, precisie=HLL_PRECISIE):
+    bewegingen = df[df['STD'].notna() & df['TAR'].notna() & df[kolom].notna()]
+    register, rang = hll_register_rang(bewegingen['TAR'], precisie)
+    return houd_hll_trappen(pd.DataFrame({
+        'LSV': bewegingen['LSV'].array,
+        kolom: bewegingen[kolom].array,
+        'register': register,
+        'rang': rang,
+        'STD': bewegingen['STD'].to_numpy()
+    }), kolom)
+
+# Functie om de HyperLogLog-trappen bij te werken met nieuwe bewegingen
+def werk_hll_trappen_bij(trappen, nieuw, kolom):
+    if nieuw.empty:
+        return trappen
+    return houd_hll_trappen(pd.concat([trappen, hll_trappen(nieuw, kolom)], ignore_index=True), kolom)
+
+# Functie voor een geschatte drukte-index met HyperLogLog, voor heel grote datasets. In plaats van alle
+# (luchthaven, TAR)-paren zijn alleen de trappen nodig (zie hll_trappen). Per luchthaven worden 2^precisie lopende
+# registers bijgehouden; de trappen worden dag voor dag toegepast en alleen voor de luchthavens die die dag
+# veranderen wordt de schatting opnieuw berekend. Geeft dezelfde vorm als bouw_drukte_index, met afgeronde schattingen.
+def bouw_hll_drukte_index(trappen, kolom, freq='D', precisie=HLL_PRECISIE):
+    plaatsen = pd.Index(trappen[kolom].unique()).sort_values()
+    if trappen.empty:
+        leeg = np.zeros((0, len(plaatsen)), dtype=np.int32)
+        return pd.DatetimeIndex([]), plaatsen, leeg, leeg
+    dagen = pd.date_range(trappen['STD'].min().ceil(freq), trappen['STD'].max().ceil(freq), freq=freq)
+
+    def cumulatief(lsv):
+        per_lsv = trappen[trappen['LSV'] == lsv]
+        dag = dagen.searchsorted(per_lsv['STD'].dt.ceil(freq))
+        plaats = plaatsen.get_indexer(per_lsv[kolom])
+        register = per_lsv['register'].to_numpy()
+        rang = per_lsv['rang'].to_numpy()
+
+        registers = np.zeros((len(plaatsen), 2 ** precisie), dtype=np.uint8)
+        schatting = np.zeros(len(plaatsen), dtype=np.int32)
+        telling = np.zeros((len(dagen), len(plaatsen)), dtype=np.int32)
+        # De trappen zijn op STD gesorteerd, dus elke dag is één aaneengesloten blok
+        dagen_met_trappen, begin = np.unique(dag, return_index=True)
+        for d, b, e in zip(dagen_met_trappen, begin, np.append(begin[1:], len(dag))):
+            np.maximum.at(registers, (plaats[b:e], register[b:e]), rang[b:e])
+            veranderd = np.unique(plaats[b:e])
+            schatting[veranderd] = np.rint(hll_schatting(registers[veranderd]))
+            telling[d] = schatting
+
+        # Dagen zonder trappen houden de stand van de vorige dag
+        bijgewerkt = np.zeros(len(dagen), dtype=bool)
+        bijgewerkt[dagen_met_trappen] = True
+        return telling[np.maximum.accumulate(np.where(bijgewerkt, np.arange(len(dagen)), 0))]
+
+    return dagen, plaatsen, cumulatief('L'), cumulatief('S')
+
+# Functie voor laden van de eerste keren per luchthavenkolom (incrementeel bijgewerkt, zie incrementeel)
+def load_eerste_keer_gezien(signatuur, kolom):
+    return incrementeel(('eerste_keer', kolom), signatuur, lambda df: eerste_keer_gezien(df, kolom),
+                        lambda eerste, nieuw: werk_eerste_keer_bij(eerste, nieuw, kolom))
+
+# Functie voor laden van de HyperLogLog-trappen per luchthavenkolom (incrementeel bijgewerkt, zie incrementeel)
+def load_hll_trappen(signatuur, kolom):
+    return incrementeel(('hll_trappen', kolom), signatuur, lambda df: hll_trappen(df, kolom),
+                        lambda trappen, nieuw: werk_hll_trappen_bij(trappen, nieuw, kolom))
+
+# Functie voor laden van de drukte-index van de luchthavendata per luchthavenkolom ('City' of 'luchthaven').
+# Met methode='hll' wordt de geschatte index (HyperLogLog) gebruikt in plaats van de exacte.
+@st.cache_data
+def load_drukte_index(signatuur, kolom, freq='D', methode='exact'):
+    if methode == 'hll':
+        return bouw_hll_drukte_index(load_hll_trappen(signatuur, kolom), kolom, freq)
+    return bouw_drukte_index(load_eerste_keer_gezien(signatuur, kolom), freq)
+
+# Functie om per luchthaven (kolom) en per dag het cumulatieve aantal landingen te tellen (alle landingen met een
+# TAR, niet alleen verschillende vliegtuigen). Geeft de dagen, de luchthavens en de matrix (dag x luchthaven).
+def bouw_landingen_index(df, kolom, freq='D'):
+    landingen = df[(df['LSV'] == 'L') & df['STD'].notna() & df['TAR'].notna() & df[kolom].notna()]
+    plaatsen = pd.Index(landingen[kolom].unique()).sort_values()
+    if landingen.empty:
+        return pd.DatetimeIndex([]), plaatsen, np.zeros((0, len(plaatsen)), dtype=np.int32)
+    dagen = pd.date_range(landingen['STD'].min().ceil(freq), landingen['STD'].max().ceil(freq), freq=freq)
+    dag = dagen.searchsorted(landingen['STD'].dt.ceil(freq))
+    plaats = plaatsen.get_indexer(landingen[kolom])
+    telling = np.bincount(dag * len(plaatsen) + plaats, minlength=len(dagen) * len(plaatsen))
+    return dagen, plaatsen, telling.reshape(len(dagen), len(plaatsen)).cumsum(axis=0).astype(np.int32)
+
+# Functie voor laden van de landingen-index van de luchthavendata
+@st.cache_data
+def load_landingen_index(signatuur, kolom, freq='D'):
+    return bouw_landingen_index(load_luchthaven_data(signatuur), kolom, freq)
+
+# Functie om uit de drukte-index het aantal vliegtuigen per luchthaven op een datum op te zoeken.
+# Alleen luchthavens waar tot dan toe een vliegtuig geland is komen in het resultaat.
+def drukte_op_datum(index, kolom, datum):
+    dagen, plaatsen, geland, vertrokken = index
+    rij = np.searchsorted(dagen, pd.Timestamp(datum), side='right') - 1
+    if rij < 0:
+        return pd.DataFrame({kolom: [], 'Aantal_vliegtuigen': [], 'Aantal_vertrokken': []})
+    aanwezig = geland[rij] > 0
+    return pd.DataFrame({
+        kolom: plaatsen[aanwezig],
+        'Aantal_vliegtuigen': geland[rij][aanwezig] - vertrokken[rij][aanwezig],
+        'Aantal_vertrokken': vertrokken[rij][aanwezig]
+    })
+
+# Dimensies van de kubus met vooraf opgetelde bewegingen en vertragingen
+KUBUS_SLEUTELS = ['City', 'Jaartal', 'maand', 'LSV', 'status']
+
+# Functie om bewegingen op te tellen tot een kubus (City x Jaartal x maand x LSV x status) met per cel het aantal
+# bewegingen, het aantal met een bekende vertraging, de som van de vertragingen en de som van hun kwadraten.
+# Gemiddelde en standaardafwijking voor elke combinatie van dimensies volgen daaruit door op te tellen.
+def bouw_kubus(df):
+    vertraging = df['verschil_minuten'].astype('float64')
+    cellen = pd.DataFrame({
+        'City': df['City'], 'Jaartal': df['Jaartal'], 'maand': df['STD'].dt.month, 'LSV': df['LSV'], 'status': df['status'],
+        'aantal': 1, 'aantal_vertraging': vertraging.notna().astype(int),
+        'som_vertraging': vertraging.fillna(0), 'som_kwadraat_vertraging': (vertraging ** 2).fillna(0)
+    })
+    return cellen.groupby(KUBUS_SLEUTELS, observed=True, dropna=False, as_index=False).sum()
+
+# Functie om een kubus bij te werken met nieuwe bewegingen: alleen de nieuwe rijen worden opgeteld
+def werk_kubus_bij(kubus, nieuw):
+    if nieuw.empty:
+        return kubus
+    samen = pd.concat([kubus, bouw_kubus(nieuw)], ignore_index=True)
+    return samen.groupby(KUBUS_SLEUTELS, observed=True, dropna=False, as_index=False).sum()
+
+# Functie om een kubus op te rollen naar de gegeven dimensies, met aantal, gemiddelde en standaardafwijking
+# van de vertraging (minuten) per groep
+def rol_kubus_op(kubus, sleutels):
+    groep = kubus.groupby(sleutels, observed=True, as_index=False)[
+        ['aantal', 'aantal_vertraging', 'som_vertraging', 'som_kwadraat_vertraging']].sum()
+    n = groep['aantal_vertraging'].where(groep['aantal_vertraging'] > 0)
+    groep['gemiddelde_vertraging'] = groep['som_vertraging'] / n
+    variantie = (groep['som_kwadraat_vertraging'] - n * groep['gemiddelde_vertraging'] ** 2) / (n - 1).where(n > 1)
+    groep['std_vertraging'] = np.sqrt(variantie.clip(lower=0))
+    return groep
+
+# Functie die een rij van de luchthavendata herkenbaar maakt, om te controleren of het bestand alleen is aangevuld
+def rij_sleutel(df, rij):
+    return df.iloc[rij][['City', 'TAR', 'STD']].astype(str).tolist()
+
+# Functie die bepaalt tot welke rij een incrementele opslag de luchthavendata al heeft verwerkt.
+# Dat geldt alleen als het bestand sindsdien aan het eind is aangevuld (de laatst verwerkte rij is ongewijzigd);
+# anders is het antwoord 0 en moet de opslag opnieuw worden opgebouwd.
+def verwerkt_tot(opslag, df):
+    rijen = opslag.get('rijen', 0)
+    if 0 < rijen <= len(df) and rij_sleutel(df, rijen - 1) == opslag['laatste_rij']:
+        return rijen
+    return 0
+
+# Functie om in een incrementele opslag te onthouden tot waar de luchthavendata is verwerkt
+def onthoud_verwerkt(opslag, df, signatuur):
+    opslag.update(signatuur=signatuur, rijen=len(df), laatste_rij=rij_sleutel(df, -1) if len(df) else None)
+
+# Gedeelde opslag (voor alle sessies) met de incrementeel bijgewerkte afgeleiden van de luchthavendata, per naam
+@st.cache_resource
+def incrementele_opslag():
+    return {'lock': threading.Lock(), 'afgeleiden': {}}
+
+# Functie voor een afgeleide van de luchthavendata (kubus, tellingen, eerste keren, ...) die bewaard blijft en bij
+# een aangevuld bestand alleen met de nieuwe rijen wordt bijgewerkt. naam onderscheidt de afgeleiden in de opslag;
+# bouw(df) maakt de afgeleide uit alle rijen en werk_bij(oud, nieuwe_rijen) geeft een bijgewerkte (nieuwe) afgeleide.
+# Is het bestand niet alleen aan het eind aangevuld (zie verwerkt_tot), dan wordt opnieuw gebouwd.
+def incrementeel(naam, signatuur, bouw, werk_bij):
+    opslag = incrementele_opslag()
+    with opslag['lock']:
+        afgeleide = opslag['afgeleiden'].setdefault(naam, {'lock': threading.Lock()})
+    with afgeleide['lock']:
+        if afgeleide.get('signatuur') != signatuur:
+            df = load_luchthaven_data(signatuur)
+            start = verwerkt_tot(afgeleide, df)
+            afgeleide['waarde'] = werk_bij(afgeleide['waarde'], df.iloc[start:]) if start else bouw(df)
+            onthoud_verwerkt(afgeleide, df, signatuur)
+        return afgeleide['waarde']
+
+# Functie voor laden van de kubus van de luchthavendata (incrementeel bijgewerkt)
+def load_kubus(signatuur):
+    return incrementeel('kubus', signatuur, bouw_kubus, werk_kubus_bij)
+
+# Functie om het aantal bewegingen per luchthaven (City) in nieuwe rijen op te tellen bij bestaande tellingen.
+# Geeft een nieuwe Counter, zodat sessies die de oude tellingen nog lezen er geen last van hebben.
+def tel_bewegingen(tellingen, nieuw):
+    bijgewerkt = Counter(tellingen)
+    bijgewerkt.update({plaats: aantal for plaats, aantal in nieuw['City'].value_counts().items() if aantal})
+    return bijgewerkt
+
+# Functie voor de N luchthavens met de meeste bewegingen. De tellingen per luchthaven zijn exact en worden
+# bijgewerkt met alleen de nieuwe rijen als het bestand is aangevuld; de top-N komt uit een heap over de tellingen,
+# zonder de bewegingen opnieuw te doorlopen. Geeft een frame met luchthaven en aantal_vluchten, hoogste eerst.
+def load_top_luchthavens(signatuur, n=20):
+    tellingen = incrementeel('tellingen', signatuur, lambda df: tel_bewegingen(Counter(), df), tel_bewegingen)
+    top = heapq.nlargest(n, tellingen.items(), key=lambda item: item[1])
+    return pd.DataFrame(top, columns=['luchthaven', 'aantal_vluchten'])
+
+# Functie om per luchthaven de gesorteerde vertragingen (minuten, zonder ontbrekende waarden) te bepalen.
+# Na één sortering op (luchthaven, vertraging) is elke luchthaven een aaneengesloten stuk van de array.
+def bouw_vertragingsindex(df):
+    geldig = df[df['verschil_minuten'].notna()]
+    plaatsen = pd.Index(geldig['City'].dropna().unique()).sort_values()
+    codes = plaatsen.get_indexer(geldig['City'])
+    vertraging = geldig['verschil_minuten'].to_numpy()
+    volgorde = np.lexsort((vertraging, codes))
+    grenzen = np.searchsorted(codes[volgorde], np.arange(len(plaatsen) + 1))
+    gesorteerd = vertraging[volgorde]
+    return plaatsen, [gesorteerd[begin:eind] for begin, eind in zip(grenzen[:-1], grenzen[1:])]
+
+# Functie voor laden van de vertragingsindex van de luchthavendata
+@st.cache_data
+def load_vertragingsindex(signatuur):
+    return bouw_vertragingsindex(load_luchthaven_data(signatuur))
+
+# Functie om voor een drempel (minuten) het percentage vluchten per status per luchthaven te bepalen.
+# Dezelfde indeling als pd.cut met bins (-inf, 0], (0, drempel], (drempel, inf) en labels Op tijd, Te laat,
+# Te vroeg, maar met twee searchsorted-opzoekingen per luchthaven. Geeft een lang frame (City, status, percentage).
+def punctualiteit_bij_drempel(index, drempel):
+    plaatsen, vertragingen = index
+    totaal = np.array([len(x) for x in vertragingen])
+    tot_nul = np.array([np.searchsorted(x, 0, side='right') for x in vertragingen])
+    tot_drempel = np.array([np.searchsorted(x, max(drempel, 0), side='right') for x in vertragingen])
+    met_data = totaal > 0
+    percentages = pd.DataFrame({
+        'City': plaatsen[met_data],
+        'Te laat': ((tot_drempel - tot_nul) / totaal * 100)[met_data],
+        'Op tijd': (tot_nul / totaal * 100)[met_data],
+        'Te vroeg': ((totaal - tot_drempel) / totaal * 100)[met_data]
+    })
+    return percentages.melt(id_vars='City', value_vars=['Te laat', 'Op tijd', 'Te vroeg'],
+                            var_name='status', value_name='percentage')
+
+# Functie om de geanimeerde staafgrafiek van de drukte per luchthaven in één keer uit de drukte-index op te bouwen.
+# Alle stappen worden met één searchsorted opgezocht; elk frame bevat alleen de nieuwe y-waarden van de staven.
+def bouw_drukte_animatie(index, kolom, stappen):
+    dagen, plaatsen, geland, vertrokken = index
+    rijen = np.searchsorted(dagen, stappen, side='right') - 1
+    aantallen = (geland - vertrokken)[np.maximum(rijen, 0)] if len(dagen) else np.zeros((len(stappen), len(plaatsen)), dtype=np.int32)
+    aantallen[rijen < 0] = 0
+    namen = [str(stap.date()) for stap in stappen] if stappen.freqstr == 'D' else [str(stap) for stap in stappen]
+
+    frames = [
+        {
+            'name': naam,
+            'data': [{'y': rij.tolist()}],
+            'traces': [0],
+            'layout': {'title': {'text': f"Aantal vliegtuigen per luchthaven op {naam}"}}
+        }
+        for naam, rij in zip(namen, aantallen)
+    ]
+    return {
+        'data': [{'type': 'bar', 'x': plaatsen.astype(str).tolist(), 'y': aantallen[0].tolist() if len(aantallen) else []}],
+        'layout': {
+            'title': {'text': f"Aantal vliegtuigen per luchthaven op {namen[0] if namen else ''}"},
+            'xaxis': {'title': {'text': kolom}},
+            'yaxis': {'title': {'text': 'Aantal_vliegtuigen'}, 'range': [min(aantallen.min(initial=0), 0), aantallen.max(initial=0) + 1]},
+            'sliders': [{
+                'steps': [{
+                    'args': [[naam], {'frame': {'duration': 300, 'redraw': True}, 'mode': 'immediate'}],
+                    'label': naam,
+                    'method': 'animate'
+                } for naam in namen],
+                'currentvalue': {'prefix': 'Datum: '},
+                'pad': {'b': 10},
+            }]
+        },
+        'frames': frames
+    }
+
+# Functie voor laden van de geanimeerde drukte-grafiek. De figuur wordt één keer gevalideerd en gedeeld tussen
+# alle sessies (cache_resource), zodat een herhaalde weergave alleen nog de JSON hoeft te versturen; niet aanpassen.
+# Er blijven maar een paar figuren (periodes) bewaard, zodat figuren van oude signaturen niet blijven staan.
+@st.cache_resource(max_entries=8)
+def load_drukte_animatie(signatuur, kolom, start, eind, freq='D'):
+    stappen = pd.date_range(start=start, end=eind, freq=freq)
+    return go.Figure(bouw_drukte_animatie(load_drukte_index(signatuur, kolom, freq), kolom, stappen))
+
+# Functie om het aantal vliegtuigen per luchthaven (naam) op een datum te berekenen, met de coördinaten
+# en het absolute aantal landingen tot dan toe. Alle aantallen worden opgezocht in de cumulatieve indexen.
+def bereken_drukte_luchthavens(signatuur, selected_time, methode='exact'):
+    df = load_luchthaven_data(signatuur)
+    airport_traffic = drukte_op_datum(load_drukte_index(signatuur, 'luchthaven', methode=methode), 'luchthaven', selected_time)
+
+    # Voeg de coördinaten van de luchthavens toe
+    airports = df[['luchthaven', 'Latitude', 'Longitude']].drop_duplicates()
+    airport_traffic = airport_traffic.merge(airports, on='luchthaven')
+
+    # Voeg een kolom toe voor absolute drukte (aantal landingen tot en met de datum)
+    dagen, plaatsen, landingen = load_landingen_index(signatuur, 'luchthaven')
+    rij = np.searchsorted(dagen, pd.Timestamp(selected_time), side='right') - 1
+    per_plaats = pd.Series(landingen[rij] if rij >= 0 else 0, index=plaatsen.astype(str))
+    airport_traffic['Absolute_vluchten'] = per_plaats.reindex(airport_traffic['luchthaven'].astype(str)).fillna(0).to_numpy()
+
+    return airport_traffic
+
+# Functie om de drukte-kaart te bouwen: alle luchthavens als één GeoJSON-laag met cirkelmarkers
+# (straal en tooltip als properties) en de heatmap direct uit de kolommen, zonder per luchthaven een folium-object.
+def bouw_drukte_kaart(airport_traffic, absolute_mode=False):
+    # Kies welke kolom als basis voor de heatmap wordt gebruikt en pas een schaalfactor toe
+    if absolute_mode:
+        marker_column = 'Absolute_vluchten'
+        scale_factor = 0.001  # Lagere schaalfactor voor absolute aantallen
+    else:
+        marker_column = 'Aantal_vliegtuigen'
+        scale_factor = 0.15  # Hogere schaalfactor voor relatieve aantallen
+
+    lat = airport_traffic['Latitude'].to_numpy(dtype='float64')
+    lon = airport_traffic['Longitude'].to_numpy(dtype='float64')
+    waarden = airport_traffic[marker_column].to_numpy(dtype='float64')
+    geldig = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(waarden)
+    namen = airport_traffic['luchthaven'].astype(str).to_numpy()[geldig]
+    lat, lon, waarden = lat[geldig], lon[geldig], waarden[geldig]
+
+    # Maak de kaart met een centraal punt in Europa
+    traffic_map = folium.Map(location=[50, 10], zoom_start=4)
+
+    features = [
+        {
+            'type': 'Feature',
+            'id': str(n),
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': {'radius': straal, 'tooltip': f"Luchthaven: {naam}, Aantal: {aantal:g}"}
+        }
+        for n, (x, y, straal, naam, aantal) in enumerate(zip(lon.tolist(), lat.tolist(), (waarden * scale_factor).tolist(),
+                                                             namen, waarden.tolist()))
+    ]
+    if features:
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            name='Luchthavens',
+            marker=folium.CircleMarker(color='red', fill=True, fill_opacity=0.6),
+            style_function=lambda feature: {'radius': feature['properties']['radius']},
+            tooltip=folium.GeoJsonTooltip(fields=['tooltip'], labels=False)
+        ).add_to(traffic_map)
+
+    # Voeg heatmap toe gebaseerd op de gekozen data (relatief of absoluut)
+    HeatMap(np.column_stack([lat, lon, waarden]), radius=15, blur=10, max_zoom=1).add_to(traffic_map)
+
+    return traffic_map
+
+# Functie voor de HTML van de drukte-kaart, bewaard per (datum, absoluut/relatief)
+@st.cache_data(max_entries=100)
+def load_drukte_kaart_html(signatuur, datum, absolute_mode):
+    airport_traffic = bereken_drukte_luchthavens(signatuur, pd.Timestamp(datum))
+    return bouw_drukte_kaart(airport_traffic, absolute_mode)._repr_html_()
 
 # --------------------------------------------------------------------------
 
@@ -83,140 +1265,134 @@ if selected == 'Intro':
 # VLUCHTEN pagina
 
 if selected == "Vluchten": 
-    st.title("7 Vluchten (AMS - BCN)")
-
-    # Laad de 7 Excel-bestanden in een dictionary
-    vluchten_data = {
-        'vlucht 1': pd.read_excel('30Flight 1.xlsx'),
-        'vlucht 2': pd.read_excel('cleaned_30Flight 2.xlsx'),
-        'vlucht 3': pd.read_excel('cleaned_30Flight 3.xlsx'),
-        'vlucht 4': pd.read_excel('cleaned_30Flight 4.xlsx'),
-        'vlucht 5': pd.read_excel('30Flight 5.xlsx'),
-        'vlucht 6': pd.read_excel('cleaned_30Flight 6.xlsx'),
-        'vlucht 7': pd.read_excel('30Flight 7.xlsx')
-    }
+    # Laad alle vluchtbestanden (via de parquet-kopieën) in één lang frame, met per vlucht een slice
+    signatuur = vluchten_signatuur()
+    df_all = load_alle_vluchten(signatuur)
+    vluchten_data = load_vluchten_data(signatuur)
+    vlucht_namen = list(vluchten_data)
+
+    st.title(f"{len(vlucht_namen)} Vluchten (AMS - BCN)")
+    for pad, fout in df_all.attrs['fouten'].items():
+        st.warning(f"Bestand {pad} is overgeslagen: {fout}")
+    st.caption(f"Vluchtdata in het geheugen: {df_all.attrs['geheugen']['voor']:.2f} MB ingelezen, "
+               f"{df_all.attrs['geheugen']['na']:.2f} MB na omzetten naar compacte datatypes")
+    if not vlucht_namen:
+        st.warning(f"Geen vluchtbestanden gevonden ({VLUCHT_PATROON} in {VLUCHT_MAP}).")
+        st.stop()
+
+    detailniveaus = bereken_detailniveaus(signatuur)
+
+    # Puntenbudget per vlucht voor de kaart en de grafieken
+    max_punten = st.select_slider("Maximaal aantal punten per vlucht", options=[100, 250, 500, 1000, 2500, 10000], value=1000)
 
     # Dropdownmenu in Streamlit om de vlucht te selecteren
-    selected_vlucht = st.selectbox("Selecteer een vlucht", options=[f'vlucht {i}' for i in range(1, 8)])
+    selected_vlucht = st.selectbox("Selecteer een vlucht", options=vlucht_namen)
 
     # Haal de geselecteerde dataframe op
     df1 = vluchten_data[selected_vlucht]
 
-    # Checkbox om te schakelen tussen hoogte en snelheid
+    # Checkbox om te schakelen tussen hoogte en snelheid, of de route op vluchtfase te kleuren
     show_speed = st.checkbox("Toon snelheid in plaats van hoogte")
-
-    # Zorg dat de kolom numeriek is en verwijder eventuele niet-numerieke waarden
-    if show_speed:
-        df1['TRUE AIRSPEED (derived)'] = pd.to_numeric(df1['TRUE AIRSPEED (derived)'], errors='coerce')
-        values = df1['TRUE AIRSPEED (derived)'].dropna()  # Verwijder NaN waarden
-        colormap = cm.LinearColormap(colors=['yellow', 'green', 'blue', 'purple'], 
-                                     index=[0, 200, 400, 600],
-                                     vmin=values.min(), 
-                                     vmax=values.max(),
-                                     caption='Snelheid in knots')
+    show_fase = st.checkbox("Kleur de route op vluchtfase")
+
+    # De beginstand van de basiskaart wordt per vlucht en kleurmaat onthouden; zolang die niet veranderen blijft de
+    # basiskaart gelijk en worden zoom en midden alleen als stand doorgegeven (zonder de kaart opnieuw te laden)
+    maat = 'fase' if show_fase else ('snelheid' if show_speed else 'hoogte')
+    basis = st.session_state.get('kaart_basis')
+    if basis is None or basis['vlucht'] != selected_vlucht:
+        basis = {'vlucht': selected_vlucht, 'maat': maat, 'locatie': kaart_midden(df1),
+                 'zoom': st.session_state.get('kaart_zoom', 5)}
+        st.session_state['kaart_midden'] = basis['locatie']
+    elif basis['maat'] != maat:
+        basis = dict(basis, maat=maat, locatie=st.session_state['kaart_midden'], zoom=st.session_state.get('kaart_zoom', 5))
+    st.session_state['kaart_basis'] = basis
+
+    # Kies het detailniveau op basis van het laatst bekende zoomniveau van de kaart
+    kaart_zoom = st.session_state.get('kaart_zoom', basis['zoom'])
+    niveau = detailniveau_nummer(detailniveaus[selected_vlucht], zoom=kaart_zoom, max_punten=max_punten)
+    idx = detailniveaus[selected_vlucht][niveau]
+
+    # Creëer de Folium-kaart met de route als één laag, gekleurd op hoogte of snelheid.
+    # Eerder getekende routes komen uit de gedeelde routecache.
+    cache_sleutel = (selected_vlucht, niveau, signatuur)
+    if show_fase:
+        fasecodes, fasegrenzen = load_vluchtfasen(signatuur)
+        start, stop = vlucht_grenzen(df_all)[selected_vlucht]
+        m, laag = draw_flight_map(df1.assign(Fase=fasecodes[start:stop]), maat='fase', cache_sleutel=cache_sleutel,
+                                  idx=idx, locatie=basis['locatie'], zoom=basis['zoom'])
     else:
-        df1['[3d Altitude Ft]'] = pd.to_numeric(df1['[3d Altitude Ft]'], errors='coerce')
-        values = df1['[3d Altitude Ft]'].dropna()  # Verwijder NaN waarden
-        colormap = cm.LinearColormap(colors=['yellow', 'green', 'turquoise', 'blue', 'purple'], 
-                                     index=[0, 10000, 20000, 30000, 40000],
-                                     vmin=values.min(), 
-                                     vmax=values.max(),
-                                     caption='Hoogte in ft')
-
-    # Bereken het gemiddelde van de latitude en longitude om het midden van de vlucht te vinden
-    mid_lat = df1['[3d Latitude]'].mean()
-    mid_lon = df1['[3d Longitude]'].mean()
-
-    # Creëer een Folium-kaart gecentreerd op het midden van de vlucht
-    m = folium.Map(location=[mid_lat, mid_lon], zoom_start=5, tiles='CartoDB positron')
-
-    # Voeg de lijn toe, waarbij de kleur afhangt van hoogte of snelheid
-    coordinates = list(zip(df1['[3d Latitude]'], df1['[3d Longitude]'], values))
-
-    for i in range(1, len(coordinates)):
-        start = coordinates[i-1]
-        end = coordinates[i]
-        
-        # Kleur gebaseerd op hoogte of snelheid afhankelijk van de checkbox
-        color = colormap(start[2])  # De derde waarde in 'coordinates' is de hoogte of snelheid
-        
-        # Voeg polyline toe van het vorige naar het volgende punt met tooltip voor extra informatie
-        folium.PolyLine(
-            locations=[[start[0], start[1]], [end[0], end[1]]],
-            color=color, 
-            weight=2.5, 
-            opacity=1,
-            tooltip=f"Time: {df1['Time (secs)'].iloc[i]} sec, {'Speed' if show_speed else 'Altitude'}: {start[2]:.2f} {'knots' if show_speed else 'ft'}"
-        ).add_to(m)
-
-    # Voeg een marker toe voor het vertrek vliegveld (AMS - Amsterdam)
-    folium.Marker(
-        location=[df1['[3d Latitude]'].iloc[0], df1['[3d Longitude]'].iloc[0]],
-        popup="AMSTERDAM (AMS)",
-        tooltip="AMSTERDAM (AMS)"
-    ).add_to(m)
-
-    # Voeg een marker toe voor het aankomst vliegveld (BCN - Barcelona)
-    folium.Marker(
-        location=[df1['[3d Latitude]'].iloc[-1], df1['[3d Longitude]'].iloc[-1]],
-        popup="BARCELONA (BCN)",
-        tooltip="BARCELONA (BCN)"
-    ).add_to(m)
-
-    # Toon de colormap als legenda op de kaart
-    colormap.add_to(m)
-
-    # Weergave van de kaart in Streamlit
-    st_folium(m, width=700, height=600)
+        m, laag = draw_flight_map(df1, show_speed, cache_sleutel=cache_sleutel, idx=idx,
+                                  locatie=basis['locatie'], zoom=basis['zoom'])
+
+    # Weergave van de kaart in Streamlit; zoomniveau en midden worden onthouden voor de volgende keer
+    kaart = st_folium(m, feature_group_to_add=laag, width=700, height=600, zoom=kaart_zoom,
+                      center=st.session_state['kaart_midden'], returned_objects=['zoom', 'center', 'last_clicked'])
+    if kaart and kaart.get('zoom'):
+        st.session_state['kaart_zoom'] = kaart['zoom']
+    if kaart and kaart.get('center'):
+        st.session_state['kaart_midden'] = [kaart['center']['lat'], kaart['center']['lng']]
+
+    # Klik op de kaart: dichtstbijzijnde punt en alle vluchten die binnen de straal langs kwamen
+    straal_km = st.slider("Straal rond het aangeklikte punt (km)", 1, 100, 20)
+    klik = kaart.get('last_clicked') if kaart else None
+    if klik:
+        ruimtelijke_index = load_ruimtelijke_index(signatuur)
+        rij, afstand = dichtstbijzijnde_punt(ruimtelijke_index, klik['lat'], klik['lng'])
+        punt = df_all.iloc[rij]
+        st.write(f"Dichtstbijzijnde punt ({afstand:.1f} km): {punt['vlucht']}, tijd {punt['Time (secs)']:g} sec, "
+                 f"hoogte {punt['[3d Altitude Ft]']:.0f} ft")
+        st.dataframe(vluchten_binnen_straal(df_all, ruimtelijke_index, klik['lat'], klik['lng'], straal_km).round(2))
+    else:
+        st.caption("Klik op de kaart om te zien welke vluchten daar langs kwamen.")
 
   # --------------------------------------
 
  # Voeg 'ALL' toe aan de opties voor het dropdownmenu
-    selected_vlucht = st.selectbox("Selecteer een vlucht", options=['ALL'] + [f'vlucht {i}' for i in range(1, 8)])
+    selected_vlucht = st.selectbox("Selecteer een vlucht", options=['ALL'] + vlucht_namen)
 
 # Checkbox om te schakelen tussen hoogte en snelheid
     show_speed = st.checkbox("Toon snelheid in plaats van hoogte", key="speed_checkbox")
+    snelle_weergave = st.checkbox("Snelle weergave (WebGL, verkleind met LTTB)")
 
-
-# Als 'ALL' is geselecteerd, combineer de data van alle vluchten en voeg een kolom toe om de vlucht te labelen
+# Als 'ALL' is geselecteerd, gebruik de rijen van alle vluchten uit het lange frame (kolom 'vlucht' bevat het label)
+# Per vlucht wordt het detailniveau gekozen dat binnen het puntenbudget past
     if selected_vlucht == 'ALL':
-        df_all = pd.concat([df.assign(vlucht=vlucht) for vlucht, df in vluchten_data.items()], ignore_index=True)
-        df1 = df_all
+        rijen = np.concatenate([start + kies_detailniveau(detailniveaus[vlucht], max_punten=max_punten)
+                                for vlucht, (start, stop) in vlucht_grenzen(df_all).items()])
+        df1 = df_all.iloc[rijen]
     else:
-        df1 = vluchten_data[selected_vlucht]
-        df1['vlucht'] = selected_vlucht  # Voeg een kolom toe om de vlucht te labelen
-
-# Tijd omzetten van seconden naar uren
-    df1['Time (hours)'] = df1['Time (secs)'] / 3600
+        df1 = vluchten_data[selected_vlucht].iloc[kies_detailniveau(detailniveaus[selected_vlucht], max_punten=max_punten)]
 
 # Specifieke kleuren toewijzen aan elke vlucht
-    kleuren_map = {
-        'vlucht 1': 'red',
-        'vlucht 2': 'green',
-        'vlucht 3': 'blue',
-        'vlucht 4': 'orange',
-        'vlucht 5': 'purple',
-        'vlucht 6': 'brown',
-        'vlucht 7': 'pink'
-    }
+    kleuren_map = maak_kleuren_map(vlucht_namen)
 
 # Controleer of we hoogte of snelheid moeten tonen
     y_value = 'TRUE AIRSPEED (derived)' if show_speed else '[3d Altitude Ft]'
     y_label = "Snelheid (knots)" if show_speed else "Hoogte (ft)"
 
-# Zorg dat de kolom numeriek is, voor het geval er niet-numerieke waarden zijn
-    df1[y_value] = pd.to_numeric(df1[y_value], errors='coerce')
+# Snelle weergave: per vlucht één WebGL-lijn, verkleind tot het puntenbudget.
+# Inzoomen gaat via het tijdvenster; binnen een kleiner venster wordt de volledige resolutie opgehaald.
+    if snelle_weergave:
+        max_uren = float(np.ceil(df_all['Time (hours)'].max() * 20) / 20)
+        venster = st.slider("Tijdvenster (uren)", 0.0, max_uren, (0.0, max_uren), step=0.05)
+        fig = go.Figure()
+        for vlucht in (vlucht_namen if selected_vlucht == 'ALL' else [selected_vlucht]):
+            x, y = load_lttb_reeks(signatuur, vlucht, y_value, venster, max_punten)
+            fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=vlucht, line={'color': kleuren_map[vlucht]}))
+        fig.update_layout(title=f'{y_label} vs Tijd', xaxis_title="Tijd (uren)", yaxis_title=y_label,
+                          legend_title_text='vlucht')
 
 # Maak de lijnplot met verschillende kleuren per vlucht
-    fig = px.line(
-        df1, 
-        x='Time (hours)', 
-        y=y_value,
-        title=f'{y_label} vs Tijd',  
-        labels={"Time (hours)": "Tijd (uren)", y_value: y_label},
-        color='vlucht',  
-        color_discrete_map=kleuren_map  
-    )
+    else:
+        fig = px.line(
+            df1, 
+            x='Time (hours)', 
+            y=y_value,
+            title=f'{y_label} vs Tijd',  
+            labels={"Time (hours)": "Tijd (uren)", y_value: y_label},
+            color='vlucht',  
+            color_discrete_map=kleuren_map  
+        )
 
 # Toon de grafiek in Streamlit
     st.plotly_chart(fig)
@@ -226,39 +1402,153 @@ if selected == "Vluchten":
 # Voeg een checkbox toe om te wisselen tussen hoogte en snelheid
     show_speed = st.checkbox("Toon snelheid in plaats van hoogte", key="speed_checkboxx")
 
-# Concateneer alle vluchten in één dataframe met een kolom om de vlucht te labelen
-    df_all = pd.concat([df.assign(vlucht=vlucht) for vlucht, df in vluchten_data.items()], ignore_index=True)
-
 # Selecteer de kolomnaam op basis van de checkbox
     y_axis_column = 'TRUE AIRSPEED (derived)' if show_speed else '[3d Altitude Ft]'
     y_axis_label = 'Snelheid (knopen)' if show_speed else 'Hoogte (ft)'
 
-    color_sequence = ['red', 'green', 'blue', 'orange', 'purple', 'brown', 'pink']
-
-# Maak de boxplot met verschillende kleuren per vlucht
-    fig = px.box(df_all, x='vlucht', y=y_axis_column, 
-                 title=f"{y_axis_label} per vlucht",
-                 labels={"vlucht": "Vlucht", y_axis_column: y_axis_label},
-                 color='vlucht',
-                 color_discrete_sequence=color_sequence)
+# Maak de boxplot met verschillende kleuren per vlucht, uit de vooraf berekende statistieken
+    boxstatistieken, uitschieters = load_boxstatistieken(signatuur, y_axis_column)
+    fig = go.Figure()
+    for vlucht, rij in boxstatistieken.iterrows():
+        fig.add_trace(go.Box(x=[vlucht], q1=[rij['q1']], median=[rij['mediaan']], q3=[rij['q3']],
+                             lowerfence=[rij['onder']], upperfence=[rij['boven']],
+                             name=vlucht, marker_color=kleuren_map[vlucht], legendgroup=vlucht))
+        punten = uitschieters[uitschieters['vlucht'] == vlucht]
+        fig.add_trace(go.Scatter(x=punten['vlucht'], y=punten['waarde'], mode='markers', showlegend=False,
+                                 marker={'color': kleuren_map[vlucht]}, legendgroup=vlucht))
+    fig.update_layout(title=f"{y_axis_label} per vlucht", xaxis_title="Vlucht", yaxis_title=y_axis_label,
+                      legend_title_text='vlucht')
 
 # Toon de grafiek in Streamlit
     st.plotly_chart(fig)
+#-----------------------------------------------------------------------------------------------
+# Totale afstand en vluchtduur per vlucht, uit de opgeslagen samenvatting per vlucht
+    samenvatting = load_vluchtsamenvatting(signatuur)
+    totale_afstanden = samenvatting['Afstand (km)']
+    vluchtduur_per_vlucht = samenvatting['Vluchtduur (uren)']
+
+# Plot de twee grafieken naast elkaar met Plotly
+    fig2 = make_subplots(rows=1, cols=2, subplot_titles=("Totale Afstanden per Vlucht", "Vluchtduur per Vlucht"))
+
+# Grafiek 1: Totale Afstand per vlucht
+    fig2.add_trace(go.Bar(x=totale_afstanden.index.tolist(),
+                          y=totale_afstanden.values,
+                          name="Totale Afstand (km)",
+                          marker_color='skyblue'),
+                   row=1, col=1)
+
+# Stel de y-as limiet in voor de totale afstandsgrafiek (1200 tot 1350 km)
+    fig2.update_yaxes(range=[1200, 1350], row=1, col=1)
+
+# Grafiek 2: Vluchtduur per vlucht
+    fig2.add_trace(go.Bar(x=vluchtduur_per_vlucht.index.tolist(),
+                          y=vluchtduur_per_vlucht.values,
+                          name="Vluchtduur (uren)",
+                          marker_color='lightgreen'),
+                   row=1, col=2)
+
+# Update layout voor beide grafieken
+    fig2.update_layout(
+        title_text="Afstand en Vluchtduur per Vlucht (AMS naar BCN)",
+        showlegend=False,
+        height=600, width=1000
+    )
+
+# Y-as titels voor de afzonderlijke grafieken
+    fig2.update_yaxes(title_text="Afstand (km)", row=1, col=1)
+    fig2.update_yaxes(title_text="Vluchtduur (uren)", row=1, col=2)
+
+# Toon de figuur
+    st.plotly_chart(fig2)
+
+# Duur van elke vluchtfase per vlucht, uit de samenvatting
+    fig_fasen = go.Figure([
+        go.Bar(x=samenvatting.index, y=samenvatting[f'Duur {fase} (min)'], name=fase, marker_color=kleur)
+        for fase, kleur in zip(VLUCHTFASEN, FASE_KLEUREN)
+    ])
+    fig_fasen.update_layout(barmode='stack', title='Duur per vluchtfase', xaxis_title='Vlucht', yaxis_title='Duur (min)')
+    st.plotly_chart(fig_fasen)
+
+# Afwijking van de directe route (grootcirkel AMS - BCN) per vlucht
+    st.subheader("Afwijking van de directe route")
+    fig_corridor = make_subplots(rows=1, cols=2, subplot_titles=("Maximale afwijking per vlucht", "Extra gevlogen afstand per vlucht"))
+    fig_corridor.add_trace(go.Bar(x=samenvatting.index, y=samenvatting['Max afwijking (km)'], marker_color='salmon'), row=1, col=1)
+    fig_corridor.add_trace(go.Bar(x=samenvatting.index, y=samenvatting['Extra afstand (km)'], marker_color='gold'), row=1, col=2)
+    fig_corridor.update_yaxes(title_text="Afwijking (km)", row=1, col=1)
+    fig_corridor.update_yaxes(title_text="Extra afstand (km)", row=1, col=2)
+    fig_corridor.update_layout(showlegend=False, height=500, width=1000)
+    st.plotly_chart(fig_corridor)
+
+# Afwijking langs de route voor alle vluchten: per vlucht één WebGL-lijn, met LTTB verkleind tot het puntenbudget
+    fig_afwijking_route = go.Figure()
+    for vlucht, (x, y) in load_corridor_reeksen(signatuur, max_punten).items():
+        fig_afwijking_route.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=vlucht, line={'color': kleuren_map[vlucht]}))
+    fig_afwijking_route.update_layout(title='Afwijking van de directe route langs de vlucht (positief = rechts van de route)',
+                                      xaxis_title='Cumulatieve afstand (km)', yaxis_title='Afwijking (km)',
+                                      legend_title_text='vlucht')
+    st.plotly_chart(fig_afwijking_route)
+
+# Toon de volledige samenvatting per vlucht
+    st.subheader("Samenvatting per vlucht")
+    st.dataframe(samenvatting.round(2))
+#-----------------------------------------------------------------------------------------------
+# Vergelijking van de hoogteprofielen van alle vluchten op een gemeenschappelijk raster
+    st.subheader("Hoogteprofiel van de vloot")
+    uitlijning = st.radio("Vluchten uitlijnen op", ['tijd', 'afstand'],
+                          format_func=lambda x: 'Tijd sinds vertrek' if x == 'tijd' else 'Afgelegde afstand (fractie van de route)',
+                          horizontal=True)
+    raster, matrix = load_uitgelijnde_vluchten(signatuur, uitlijning)
+    namen = vlucht_namen
+
+# Gemiddelde, mediaan en min/max-band zijn reducties over de vluchten-as
+    gemiddelde = np.nanmean(matrix, axis=0)
+    mediaan = np.nanmedian(matrix, axis=0)
+    minimum, maximum = np.nanmin(matrix, axis=0), np.nanmax(matrix, axis=0)
+    x_as = raster / 3600 if uitlijning == 'tijd' else raster
+    x_label = 'Tijd sinds vertrek (uren)' if uitlijning == 'tijd' else 'Afgelegde afstand (fractie)'
+
+    fig_vloot = go.Figure([
+        go.Scatter(x=x_as, y=maximum, line={'width': 0}, showlegend=False, hoverinfo='skip'),
+        go.Scatter(x=x_as, y=minimum, line={'width': 0}, fill='tonexty', fillcolor='rgba(0, 0, 255, 0.15)', name='Min - max'),
+        go.Scatter(x=x_as, y=gemiddelde, line={'color': 'blue'}, name='Gemiddelde'),
+        go.Scatter(x=x_as, y=mediaan, line={'color': 'black', 'dash': 'dash'}, name='Mediaan')
+    ])
+    fig_vloot.update_layout(title=f'Hoogte van {len(namen)} vluchten', xaxis_title=x_label, yaxis_title='Hoogte (ft)')
+    st.plotly_chart(fig_vloot)
+
+# Gemiddelde absolute afwijking van de mediaan per vlucht
+    afwijking = np.nanmean(np.abs(matrix - mediaan), axis=1)
+    fig_afwijking = px.bar(x=namen, y=afwijking, title='Gemiddelde afwijking van de mediaan van de vloot',
+                           labels={'x': 'Vlucht', 'y': 'Afwijking (ft)'}, color=namen, color_discrete_map=kleuren_map)
+    fig_afwijking.update_layout(showlegend=False)
+    st.plotly_chart(fig_afwijking)
+#-----------------------------------------------------------------------------------------------
+# Live modus: volg een vlucht terwijl het trackbestand groeit (test met replay_vlucht.py)
+    st.subheader("Live vlucht volgen")
+    if st.checkbox("Live modus (volg een groeiend trackbestand)"):
+        live_pad = st.text_input("Trackbestand (CSV of NDJSON)", value='live_track.csv')
+        live_interval = st.slider("Verversen elke (seconden)", 1, 30, 5)
+        st.fragment(run_every=live_interval)(toon_live_track)(live_pad)
 #-----------------------------------------------------------------------------------------------    
 if selected == 'Luchthavens':
     st.title("Luchthavens")
-    st.subheader("Top 20 luchthavens")
+    st.subheader("Top luchthavens")
 
     # Lees de datasets in
-    df = pd.read_csv("DatasetLuchthaven_murged2.csv")
-    luchthaven_frequentie = pd.read_csv("luchthaven_frequentie.csv")
-
-    # Maak een bar plot van de 20 meest voorkomende luchthavens met Plotly
+    luchthaven_sig = luchthaven_signatuur()
+    df = load_luchthaven_data(luchthaven_sig)
+    st.caption(f"Luchthavendata in het geheugen: {df.attrs['geheugen']['voor']:.1f} MB ingelezen, "
+               f"{df.attrs['geheugen']['na']:.1f} MB na omzetten naar compacte datatypes")
+    # Aantal luchthavens in de top, bijgehouden uit de bewegingen zelf
+    aantal_top = st.slider("Aantal luchthavens in de top", 5, 50, 20)
+    luchthaven_frequentie = load_top_luchthavens(luchthaven_sig, aantal_top)
+
+    # Maak een bar plot van de meest voorkomende luchthavens met Plotly
     fig = px.bar(
         luchthaven_frequentie,
         x='luchthaven',
         y='aantal_vluchten',
-        title='Top 20 Meest Voorkomende Luchthavens',
+        title=f'Top {aantal_top} Meest Voorkomende Luchthavens',
         labels={'luchthaven': 'luchthaven', 'aantal_vluchten': 'Aantal Vluchten'},
         color_discrete_sequence=['blue']  # Maak alle bars blauw
     )
@@ -276,7 +1566,8 @@ if selected == 'Luchthavens':
 
 # Zorg ervoor dat je DataFrame 'df' gedefinieerd is en klaar is voor gebruik
 # Groeperen per luchthaven en berekenen van het aantal vluchten
-    luchthaven_counts = df.groupby('City').size().reset_index(name='Totaal aantal vluchten')
+    kubus = load_kubus(luchthaven_sig)
+    luchthaven_counts = rol_kubus_op(kubus, ['City'])[['City', 'aantal']].rename(columns={'aantal': 'Totaal aantal vluchten'})
 
 # Sorteren op aantal vluchten, van hoog naar laag
     luchthaven_counts_sorted = luchthaven_counts.sort_values(by='Totaal aantal vluchten', ascending=False).reset_index(drop=True)
@@ -307,7 +1598,7 @@ if selected == 'Luchthavens':
     st.subheader("Luchthavens zijn optijd?")
 
 # Groeperen per luchthaven en status
-    grouped = df.groupby(['City', 'status']).size().unstack(fill_value=0)
+    grouped = rol_kubus_op(kubus, ['City', 'status']).pivot(index='City', columns='status', values='aantal').fillna(0)
 
     # Berekenen van het percentage per luchthaven
     grouped_percentage = grouped.div(grouped.sum(axis=1), axis=0) * 100
@@ -327,13 +1618,6 @@ if selected == 'Luchthavens':
 
 # Toon de plot in Streamlit
     st.plotly_chart(fig)
-# Bereken de vertraging in minuten
-    df['vertraging_minuten'] = (df['verschil_minuten'])
-
-# Bepaal de status op basis van de vertraging
-    df['status'] = pd.cut(df['vertraging_minuten'],
-                      bins=[-float('inf'), 0, 1, float('inf')],
-                      labels=['Op tijd', 'Te laat', 'Te vroeg'])
 # Voeg een checkbox toe voor de extra functionaliteiten
     show_extra_features = st.checkbox("Toon extra details")
 
@@ -344,20 +1628,8 @@ if selected == 'Luchthavens':
     # Voeg een slider toe om het drempelpercentage voor op tijd aan te passen
         tijd_drempel = st.slider("Stel het aantal minuten in voor een vlucht om als op tijd te worden beschouwd:", 0, 60, 5)
 
-    # Bepaal de nieuwe status op basis van de geselecteerde tijdsgrens
-        df['status'] = pd.cut(df['vertraging_minuten'],
-                              bins=[-float('inf'), 0, tijd_drempel, float('inf')],
-                              labels=['Op tijd', 'Te laat', 'Te vroeg'])
-
-    # Groeperen per luchthaven en status
-        grouped = df.groupby(['City', 'status']).size().unstack(fill_value=0)
-
-    # Berekenen van het percentage per luchthaven
-        grouped_percentage = grouped.div(grouped.sum(axis=1), axis=0) * 100
-
-    # Voor plotly moeten we het DataFrame omzetten naar een lang formaat
-        grouped_percentage_reset = grouped_percentage.reset_index().melt(id_vars='City', value_vars=['Te laat', 'Op tijd', 'Te vroeg'],
-                                                                         var_name='status', value_name='percentage')
+    # Bepaal per luchthaven het percentage per status bij de geselecteerde tijdsgrens (uit de gesorteerde vertragingen)
+        grouped_percentage_reset = punctualiteit_bij_drempel(load_vertragingsindex(luchthaven_sig), tijd_drempel)
 
     # Maak een nieuwe gestapelde bar plot met de aangepaste drempel
         fig_drempel = px.bar(grouped_percentage_reset, x='City', y='percentage', color='status',
@@ -373,14 +1645,9 @@ if selected == 'Luchthavens':
 
 
 # Gemiddelde vertraging per luchthaven en jaar berekenen
-    gemiddelde_vertraging = df.groupby(['City', 'Jaartal'])['verschil_minuten'].mean().reset_index()
-
-# Aantal vluchten per luchthaven en jaar tellen
-    aantal_vluchten = df.groupby(['City', 'Jaartal']).size().reset_index(name='aantal_vluchten')
-
-# De resultaten samenvoegen
-    if not gemiddelde_vertraging.empty and not aantal_vluchten.empty:
-        gemiddelde_vertraging = gemiddelde_vertraging.merge(aantal_vluchten, on=['City', 'Jaartal'])
+# samen met het aantal vluchten per luchthaven en jaar (opgerold uit de kubus)
+    gemiddelde_vertraging = rol_kubus_op(kubus, ['City', 'Jaartal']).rename(
+        columns={'gemiddelde_vertraging': 'verschil_minuten', 'aantal': 'aantal_vluchten'})
 
 # Split de data op basis van jaartal
     df_2019 = gemiddelde_vertraging[gemiddelde_vertraging['Jaartal'] == 2019]
@@ -404,6 +1671,7 @@ if selected == 'Luchthavens':
             labels={'City': 'ICAO', 'verschil_minuten': 'Gemiddelde vertraging (minuten)'},
             color='verschil_minuten',
             text='aantal_vluchten',  # Aantal vluchten als tekstlabel
+            hover_data={'std_vertraging': ':.1f'},  # Spreiding van de vertraging in de tooltip
             color_continuous_scale=px.colors.sequential.Viridis
         )
 
@@ -421,6 +1689,7 @@ if selected == 'Luchthavens':
             labels={'City': 'Luchthaven', 'verschil_minuten': 'Gemiddelde vertraging (minuten)'},
             color='verschil_minuten',
             text='aantal_vluchten',  # Aantal vluchten als tekstlabel
+            hover_data={'std_vertraging': ':.1f'},  # Spreiding van de vertraging in de tooltip
             color_continuous_scale=px.colors.sequential.Viridis
         )
 
@@ -430,28 +1699,9 @@ if selected == 'Luchthavens':
 
 # Subheader voor drukte op luchthavens
     st.subheader("Drukte op luchthavens in de tijd")
-# Bereken het aantal vliegtuigen op elke luchthaven op een bepaald moment
+# Bereken het aantal vliegtuigen op elke luchthaven op een bepaalde datum (opzoeken in de drukte-index)
     def calculate_aircraft_on_airport(selected_time):
-    # Zorg ervoor dat de STD-kolom correct is geformatteerd als datetime
-      df['STD'] = pd.to_datetime(df['STD'], errors='coerce')
-    
-    # Zorg ervoor dat selected_time een pd.Timestamp is
-      if not isinstance(selected_time, pd.Timestamp):
-          selected_time = pd.to_datetime(selected_time)
-    
-    # Filter de dataframe op basis van landingen en vertrektijden
-      landed = df[(df['LSV'] == 'L') & (df['STD'].notna()) & (df['STD'] <= selected_time)]
-      departed = df[(df['LSV'] == 'S') & (df['STD'].notna()) & (df['STD'] <= selected_time)]
-    
-    # Tel het aantal vliegtuigen per luchthaven
-      landed_count = landed.groupby('City')['TAR'].nunique().reset_index(name='Aantal_vliegtuigen')
-      departed_count = departed.groupby('City')['TAR'].nunique().reset_index(name='Aantal_vertrokken')
-
-    # Bereken het aantal vliegtuigen dat nog op de luchthaven is
-      airport_traffic = pd.merge(landed_count, departed_count, on='City', how='left').fillna(0)
-      airport_traffic['Aantal_vliegtuigen'] = airport_traffic['Aantal_vliegtuigen'] - airport_traffic['Aantal_vertrokken']
-
-      return airport_traffic
+      return drukte_op_datum(load_drukte_index(luchthaven_sig, 'City'), 'City', selected_time)
 
 
 
@@ -482,37 +1732,7 @@ if selected == 'Luchthavens':
     st.write("")  
 # Interactieve grafiek met een slider
     def create_aircraft_slider_plot():
-        start_date = pd.to_datetime('2019-01-01')
-        end_date = pd.to_datetime('2020-12-31')
-        days = pd.date_range(start=start_date, end=end_date, freq='D')
-
-        frames = []
-
-        for day in days:
-          filtered_data = calculate_aircraft_on_airport(day)
-          fig = px.bar(filtered_data, x='City', y='Aantal_vliegtuigen', title=f"Aantal vliegtuigen per luchthaven op {day.date()}")
-          frames.append(go.Frame(data=fig.data, name=str(day.date())))
-
-    # Initiële figuur
-        initial_fig = calculate_aircraft_on_airport(days[0])
-        fig = px.bar(initial_fig, x='City', y='Aantal_vliegtuigen', title=f"Aantal vliegtuigen per luchthaven op {days[0].date()}")
-
-        fig = go.Figure(
-            data=fig.data,
-            layout=go.Layout(
-                sliders=[{
-                    'steps': [{
-                        'args': [[str(day.date())], {'frame': {'duration': 300, 'redraw': True}, 'mode': 'immediate'}],
-                        'label': str(day.date()),
-                        'method': 'animate'
-                    } for day in days],
-                    'currentvalue': {'prefix': 'Datum: '},
-                    'pad': {'b': 10},
-                }]
-            ),
-            frames=frames
-        )
-
+        fig = load_drukte_animatie(luchthaven_sig, 'City', '2019-01-01', '2020-12-31')
         st.plotly_chart(fig)
 
 # Aanroepen van de slider grafiek
@@ -569,69 +1789,13 @@ if selected == 'Luchthavens':
 # Checkbox om te wisselen tussen relatieve en absolute drukte
     absolute_checkbox = st.checkbox("Toon absolute drukte")
 
-# Zorg ervoor dat de coördinaten numeriek zijn
-    df['Latitude'] = df['Latitude'].astype(str).str.replace(',', '.').astype(float)
-    df['Longitude'] = df['Longitude'].astype(str).str.replace(',', '.').astype(float)
-
-# Voeg een nieuwe kolom toe voor de tijdstippen van de gebeurtenissen
-    df['STD'] = pd.to_datetime(df['STD'])  # Zorg dat STD als datetime is
-
 # Bereken het aantal vliegtuigen op elke luchthaven op een bepaald moment
     def calculate_aircraft_on_airport(selected_time):
-    # Filter de data voor alle vluchten die al geland zijn, maar nog niet vertrokken op het gekozen tijdstip
-        landed = df[(df['LSV'] == 'L') & (df['STD'] <= selected_time)]
-        departed = df[(df['LSV'] == 'S') & (df['STD'] <= selected_time)]
-
-    # Groepeer de vluchten per luchthaven en tel het aantal vliegtuigen dat er nog is
-        landed_count = landed.groupby('luchthaven')['TAR'].nunique().reset_index(name='Aantal_vliegtuigen')
-        departed_count = departed.groupby('luchthaven')['TAR'].nunique().reset_index(name='Aantal_vertrokken')
-
-    # Voeg de twee datasets samen en bereken het aantal vliegtuigen dat nog aanwezig is
-        airport_traffic = pd.merge(landed_count, departed_count, on='luchthaven', how='left').fillna(0)
-        airport_traffic['Aantal_vliegtuigen'] = airport_traffic['Aantal_vliegtuigen'] - airport_traffic['Aantal_vertrokken']
-
-    # Voeg de coördinaten van de luchthavens toe
-        airports = df[['luchthaven', 'Latitude', 'Longitude']].drop_duplicates()
-        airport_traffic = airport_traffic.merge(airports, on='luchthaven')
-
-    # Voeg een kolom toe voor absolute drukte (aantal vluchten)
-        airport_traffic['Absolute_vluchten'] = landed.groupby('luchthaven')['TAR'].count().values
-
-        return airport_traffic
+        return bereken_drukte_luchthavens(luchthaven_sig, selected_time)
 
 # Maak een functie om de kaart te genereren, inclusief een heatmap
     def create_aircraft_traffic_map(selected_time, absolute_mode=False):
-    # Bereken het aantal vliegtuigen op de luchthavens op de geselecteerde tijd
-        airport_traffic = calculate_aircraft_on_airport(selected_time)
-
-    # Kies welke kolom als basis voor de heatmap wordt gebruikt en pas een schaalfactor toe
-        if absolute_mode:
-            marker_column = 'Absolute_vluchten'
-            scale_factor = 0.001  # Lagere schaalfactor voor absolute aantallen
-        else:
-            marker_column = 'Aantal_vliegtuigen'
-            scale_factor = 0.15  # Hogere schaalfactor voor relatieve aantallen
-
-    # Maak de kaart met een centraal punt in Europa
-        traffic_map = folium.Map(location=[50, 10], zoom_start=4)
-
-    # Voeg markers toe aan de kaart voor elke luchthaven
-        for idx, row in airport_traffic.iterrows():
-        # Bepaal de grootte van de marker op basis van het aantal vluchten en de schaalfactor
-            folium.CircleMarker(
-                location=[row['Latitude'], row['Longitude']],
-                radius=row[marker_column] * scale_factor,  # Pas schaalfactor toe
-                color='red',
-                fill=True,
-                fill_opacity=0.6,
-                tooltip=f"Luchthaven: {row['luchthaven']}, Aantal: {row[marker_column]}"
-            ).add_to(traffic_map)
-
-    # Voeg heatmap toe gebaseerd op de gekozen data (relatief of absoluut)
-        heat_data = [[row['Latitude'], row['Longitude'], row[marker_column]] for idx, row in airport_traffic.iterrows()]
-        HeatMap(heat_data, radius=15, blur=10, max_zoom=1).add_to(traffic_map)
-
-        return traffic_map
+        return bouw_drukte_kaart(calculate_aircraft_on_airport(selected_time), absolute_mode)
 
 # Selecteer een tijdstip voor de kaartweergave
     selected_time = st.slider(
@@ -644,11 +1808,11 @@ if selected == 'Luchthavens':
 # Converteer de geselecteerde datum terug naar een Timestamp om compatibel te zijn met de berekeningsfunctie
     selected_time = pd.Timestamp(selected_time)
 
-# Genereer de kaart op basis van de selectie van absolute of relatieve drukte
-    traffic_map = create_aircraft_traffic_map(selected_time, absolute_mode=absolute_checkbox)
+# Genereer de kaart op basis van de selectie van absolute of relatieve drukte (eerder getoonde kaarten uit de cache)
+    traffic_html = load_drukte_kaart_html(luchthaven_sig, selected_time, absolute_checkbox)
 
 # Weergeef de kaart
-    st.components.v1.html(traffic_map._repr_html_(), width=700, height=500)
+    st.components.v1.html(traffic_html, width=700, height=500)
     
 
 # Streamlit-app
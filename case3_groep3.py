@@ -165,18 +165,15 @@ if selected == "Vluchten":
     
       return R * c  # Afstand in kilometers
 
-  # Voeg een kolom toe voor de afstand tussen opeenvolgende coördinaten
+  # Voeg een kolom toe voor de afstand tussen opeenvolgende coördinaten (in één keer over de hele kolom)
   def bereken_afstand(df2):
-      afstanden = []
-      for i in range(1, len(df2)):
-          lat1, lon1 = df2.iloc[i-1]['[3d Latitude]'], df2.iloc[i-1]['[3d Longitude]']
-          lat2, lon2 = df2.iloc[i]['[3d Latitude]'], df2.iloc[i]['[3d Longitude]']
-          afstand = haversine(lat1, lon1, lat2, lon2)
-          afstanden.append(afstand)
-      afstanden.insert(0, 0)  # Eerste punt heeft geen vorige punt, dus afstand is 0
+      lat = df2['[3d Latitude]'].to_numpy()
+      lon = df2['[3d Longitude]'].to_numpy()
+      afstanden = np.zeros(len(df2))  # Eerste punt heeft geen vorige punt, dus afstand is 0
+      afstanden[1:] = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
       df2['Afstand (km)'] = afstanden
       df2['Cumulatieve afstand (km)'] = df2['Afstand (km)'].cumsum()  # Totale afstand berekenen
-      return df
+      return df2
 
   # Functie om vluchtduur te berekenen (geen hoogtepunten meer gebruiken)
   def bereken_vluchtduur(df2):
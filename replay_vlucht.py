@@ -0,0 +1,29 @@
+import argparse
+import json
+import time
+
+from vlucht_inlezen import parse_vlucht_bestand
+
+# Speelt een opgenomen vlucht af door de punten één voor één aan een trackbestand toe te voegen.
+# Bedoeld om de live modus op de Vluchten-pagina te testen, bijvoorbeeld:
+#   python replay_vlucht.py "cleaned_30Flight 1.xlsx" live_track.csv --interval 1
+
+parser = argparse.ArgumentParser(description="Speel een vluchtbestand af als groeiend CSV- of NDJSON-trackbestand")
+parser.add_argument('bron', help="Vluchtbestand (Excel of CSV)")
+parser.add_argument('doel', help="Trackbestand om naar te schrijven (.csv, .ndjson of .jsonl)")
+parser.add_argument('--interval', type=float, default=1.0, help="Seconden tussen twee punten")
+args = parser.parse_args()
+
+df = parse_vlucht_bestand(args.bron)
+ndjson = args.doel.lower().endswith(('.ndjson', '.jsonl'))
+
+with open(args.doel, 'w', encoding='utf-8') as doel:
+    if not ndjson:
+        doel.write(','.join(df.columns) + '\n')
+    for _, rij in df.iterrows():
+        if ndjson:
+            doel.write(json.dumps({kolom: waarde for kolom, waarde in rij.items() if waarde == waarde}) + '\n')
+        else:
+            doel.write(','.join('' if waarde != waarde else str(waarde) for waarde in rij) + '\n')
+        doel.flush()
+        time.sleep(args.interval)
@@ -0,0 +1,255 @@
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Inlezen van vluchtbestanden (Excel of CSV) via parquet-kopieën.
+# Dit staat in een eigen module (zonder Streamlit) zodat de functies in aparte processen kunnen draaien.
+
+# Map waarin de kolom-kopieën (parquet) van de bronbestanden worden bewaard
+CACHE_MAP = 'cache'
+
+# Kolommen die elk vluchtbestand moet hebben
+VLUCHT_KOLOMMEN = ['Time (secs)', '[3d Latitude]', '[3d Longitude]', '[3d Altitude Ft]', 'TRUE AIRSPEED (derived)']
+
+# Kolommen van de vluchtbestanden die als kommagetal moeten worden ingelezen (als ze er zijn)
+VLUCHT_FLOAT_KOLOMMEN = ['[3d Latitude]', '[3d Longitude]', '[3d Altitude M]', '[3d Altitude Ft]',
+                         '[3d Heading]', 'TRUE AIRSPEED (derived)']
+
+# Compacte datatypes voor de vluchtdata in het geheugen.
+# float32 is voor posities op ongeveer een meter nauwkeurig; berekeningen zetten zelf om naar float64.
+# De tijd wordt alleen int32 als alle tijden hele seconden zijn (zie compacteer).
+VLUCHT_SCHEMA = {
+    'Time (secs)': 'int32',
+    '[3d Latitude]': 'float32',
+    '[3d Longitude]': 'float32',
+    '[3d Altitude M]': 'float32',
+    '[3d Altitude Ft]': 'float32',
+    '[3d Heading]': 'float32',
+    'TRUE AIRSPEED (derived)': 'float32'
+}
+
+# Compacte datatypes voor de luchthavendata. Tekstkolommen met weinig verschillende waarden worden
+# categorisch, kommagetallen ('52,3') en datums worden hier één keer omgezet.
+LUCHTHAVEN_SCHEMA = {
+    'City': 'category',
+    'LSV': 'category',
+    'TAR': 'category',
+    'STD': 'datetime64[ns]',
+    'status': 'category',
+    'verschil_minuten': 'float32',
+    'Jaartal': 'int16',
+    'luchthaven': 'category',
+    'Latitude': 'float32',
+    'Longitude': 'float32'
+}
+
+
+# Functie om een korte signatuur (hash van pad, mtime en grootte) van bronbestanden te maken.
+# De signatuur verandert zodra één van de bestanden wijzigt en dient als sleutel voor de caches.
+def bron_signatuur(paden):
+    h = hashlib.md5()
+    for pad in paden:
+        stat = os.stat(pad)
+        h.update(f'{pad}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    return h.hexdigest()[:16]
+
+
+# Functie voor het geheugengebruik van een frame in MB (inclusief de tekst in object-kolommen)
+def geheugen_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+# Functie om een frame volgens een schema ({kolom: datatype}) om te zetten naar compacte datatypes.
+# Kolommen die niet in het schema staan blijven ongewijzigd. Tekst wordt als (komma)getal gelezen als het
+# schema een getal vraagt. Een geheel getal wordt float64 als er niet-hele waarden in staan (bijvoorbeeld tijden
+# met tienden van seconden), zodat er niets wordt afgekapt, en float32 als er alleen waarden ontbreken.
+def compacteer(df, schema):
+    kolommen = {}
+    for kolom in df.columns:
+        reeks = df[kolom]
+        dtype = schema.get(kolom)
+        if dtype is None or reeks.dtype == dtype:
+            pass
+        elif dtype == 'category':
+            reeks = reeks.astype('category')
+        elif dtype.startswith('datetime'):
+            reeks = pd.to_datetime(reeks, errors='coerce').astype(dtype)
+        else:
+            if not pd.api.types.is_numeric_dtype(reeks):
+                reeks = pd.to_numeric(reeks.astype(str).str.replace(',', '.'), errors='coerce')
+            if dtype.startswith('int') and not (reeks.dropna() % 1 == 0).all():
+                dtype = 'float64'
+            elif dtype.startswith('int') and reeks.isna().any():
+                dtype = 'float32'
+            reeks = reeks.astype(dtype)
+        kolommen[kolom] = reeks
+    compact = pd.DataFrame(kolommen, index=df.index)
+    compact.attrs = df.attrs
+    return compact
+
+
+# Functie om de luchthavendata (CSV) in te lezen en om te zetten naar compacte datatypes.
+# Het geheugengebruik (MB) voor en na het omzetten staat in df.attrs['geheugen'].
+def parse_luchthaven_bestand(pad):
+    ruw = pd.read_csv(pad)
+    df = compacteer(ruw, LUCHTHAVEN_SCHEMA)
+    df.attrs['geheugen'] = {'voor': geheugen_mb(ruw), 'na': geheugen_mb(df)}
+    return df
+
+
+# Functie om de luchthavendata in te lezen via een parquet-kopie met de datatypes al omgezet.
+# De CSV wordt alleen opnieuw geparsed als de mtime of grootte verandert.
+def lees_luchthaven_bestand(pad):
+    naam, signatuur = kopie_sleutel(pad)
+    return lees_of_bouw_parquet(naam, signatuur, lambda: parse_luchthaven_bestand(pad))
+
+
+# Functie die het pad van de parquet-kopie geeft voor een naam en signatuur
+def cache_pad(naam, signatuur):
+    return os.path.join(CACHE_MAP, f'{naam}-{signatuur}.parquet')
+
+
+# Functie om een frame uit de parquet-cache te lezen, of het te bouwen en weg te schrijven.
+# De naam van de kopie bevat de signatuur van de bron, dus na een wijziging wordt opnieuw gebouwd.
+def lees_of_bouw_parquet(naam, signatuur, bouw):
+    pad = cache_pad(naam, signatuur)
+    if os.path.exists(pad):
+        return pd.read_parquet(pad)
+
+    df = bouw()
+
+    # Verouderde kopieën opruimen en de nieuwe kopie atomair wegschrijven
+    os.makedirs(CACHE_MAP, exist_ok=True)
+    for oud_pad in glob.glob(os.path.join(CACHE_MAP, f'{glob.escape(naam)}-*.parquet')):
+        os.remove(oud_pad)
+    tijdelijk_pad = f'{pad}.{os.getpid()}.tmp'
+    df.to_parquet(tijdelijk_pad, index=False)
+    os.replace(tijdelijk_pad, pad)
+    return df
+
+
+# Functie om een vluchtbestand (Excel of CSV) in te lezen met de juiste datatypes.
+# Geeft een ValueError als er verplichte kolommen ontbreken.
+def parse_vlucht_bestand(pad):
+    if pad.lower().endswith('.csv'):
+        df = pd.read_csv(pad)
+    else:
+        df = pd.read_excel(pad)
+
+    ontbrekend = [kolom for kolom in VLUCHT_KOLOMMEN if kolom not in df.columns]
+    if ontbrekend:
+        raise ValueError(f"{os.path.basename(pad)} mist de kolommen {', '.join(ontbrekend)}")
+
+    # Snelheden staan soms als tekst met een sterretje ('*47.1') in het bestand
+    df['TRUE AIRSPEED (derived)'] = df['TRUE AIRSPEED (derived)'].astype(str).str.lstrip('*')
+    for kolom in VLUCHT_FLOAT_KOLOMMEN:
+        if kolom in df.columns:
+            df[kolom] = pd.to_numeric(df[kolom], errors='coerce').astype('float64')
+    df['Time (secs)'] = pd.to_numeric(df['Time (secs)'], errors='coerce')
+    return df
+
+
+# Functie die de naam en signatuur van de parquet-kopie van een bronbestand geeft
+def kopie_sleutel(pad):
+    stat = os.stat(pad)
+    return os.path.splitext(os.path.basename(pad))[0], f'{stat.st_mtime_ns}-{stat.st_size}'
+
+
+# Functie om een vluchtbestand in te lezen via een parquet-kopie.
+# Het bronbestand wordt alleen opnieuw geparsed als de mtime of grootte verandert.
+def lees_vlucht_bestand(pad):
+    naam, signatuur = kopie_sleutel(pad)
+    return lees_of_bouw_parquet(naam, signatuur, lambda: parse_vlucht_bestand(pad))
+
+
+# Functie om één bronbestand om te zetten naar een parquet-kopie (draait in een apart proces).
+# Geeft None terug als het gelukt is, anders de foutmelding.
+def converteer_vlucht_bestand(pad):
+    try:
+        lees_vlucht_bestand(pad)
+    except Exception as fout:
+        return str(fout)
+    return None
+
+
+# Functie die de vluchtbestanden in een map zoekt en elk bestand een sleutel geeft.
+# De sleutel is 'vlucht N' met N het laatste getal in de bestandsnaam, of anders de bestandsnaam zelf.
+def zoek_vluchtbestanden(map_pad, patroon):
+    paden = glob.glob(os.path.join(glob.escape(map_pad), patroon))
+    # Natuurlijke sortering, zodat 'Flight 10' na 'Flight 9' komt
+    paden.sort(key=lambda pad: [int(deel) if deel.isdigit() else deel.lower()
+                                for deel in re.split(r'(\d+)', os.path.basename(pad))])
+
+    bestanden = {}
+    for pad in paden:
+        stam = os.path.splitext(os.path.basename(pad))[0]
+        getal = re.search(r'(\d+)\D*$', stam)
+        sleutel = f'vlucht {getal.group(1)}' if getal else f'vlucht {stam}'
+        if sleutel in bestanden:
+            sleutel = f'vlucht {stam}'
+        bestanden[sleutel] = pad
+    return bestanden
+
+
+# Functie om een set vluchtbestanden in te lezen. Bestanden zonder actuele parquet-kopie worden
+# eerst parallel (één proces per bestand) omgezet; daarna worden alle kopieën ingelezen.
+# De processen worden met 'spawn' gestart: een fork van de Streamlit-server (met meerdere threads) kan vastlopen.
+# Geeft de frames per sleutel terug en de foutmeldingen voor bestanden die niet gelezen konden worden.
+def ingest_vluchten(bestanden, max_workers=None):
+    nieuw = [pad for pad in bestanden.values() if not os.path.exists(cache_pad(*kopie_sleutel(pad)))]
+    fouten = {}
+    if len(nieuw) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            for pad, fout in zip(nieuw, pool.map(converteer_vlucht_bestand, nieuw)):
+                if fout:
+                    fouten[pad] = fout
+    else:
+        for pad in nieuw:
+            fout = converteer_vlucht_bestand(pad)
+            if fout:
+                fouten[pad] = fout
+
+    frames = {
+        sleutel: lees_vlucht_bestand(pad)
+        for sleutel, pad in bestanden.items()
+        if pad not in fouten
+    }
+    return frames, fouten
+
+
+# Functie om de nieuwe regels van een groeiend trackbestand (CSV of NDJSON) te lezen.
+# positie is het aantal bytes dat al gelezen is; alleen volledige regels worden verwerkt, een half
+# geschreven laatste regel wordt de volgende keer gelezen. Bij CSV is kolommen de kopregel (None = nog niet gelezen).
+# Geeft de nieuwe punten, de nieuwe positie en de kolommen terug.
+def lees_nieuwe_regels(pad, positie=0, kolommen=None):
+    if not os.path.exists(pad) or os.path.getsize(pad) < positie:
+        # Bestand (nog) niet aanwezig of opnieuw begonnen
+        return pd.DataFrame(columns=VLUCHT_KOLOMMEN), 0, None
+
+    with open(pad, 'rb') as bestand:
+        bestand.seek(positie)
+        data = bestand.read()
+    einde = data.rfind(b'\n') + 1
+    regels = data[:einde].decode('utf-8').splitlines()
+    positie += einde
+
+    if pad.lower().endswith(('.ndjson', '.jsonl')):
+        nieuw = pd.DataFrame([json.loads(regel) for regel in regels if regel.strip()])
+    else:
+        if kolommen is None and regels:
+            kolommen = pd.read_csv(io.StringIO(regels[0])).columns.tolist()
+            regels = regels[1:]
+        tekst = '\n'.join(regel for regel in regels if regel.strip())
+        nieuw = pd.read_csv(io.StringIO(tekst), header=None, names=kolommen) if tekst else pd.DataFrame(columns=kolommen)
+
+    nieuw = nieuw.reindex(columns=nieuw.columns.union(VLUCHT_KOLOMMEN, sort=False))
+    for kolom in VLUCHT_KOLOMMEN:
+        nieuw[kolom] = pd.to_numeric(nieuw[kolom].astype(str).str.lstrip('*'), errors='coerce')
+    return nieuw, positie, kolommen